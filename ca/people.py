@@ -1,13 +1,11 @@
 # coding: utf-8
 from pupa.scrape import Scraper
 
-from utils import lxmlize, CanadianLegislator as Legislator
+from utils import get_session, lxmlize, lxmlize_many, CanadianLegislator as Legislator
 
 import json
 import re
 
-import requests
-
 COUNCIL_PAGE = 'http://www.parl.gc.ca/Parliamentarians/en/members?view=ListAll'
 
 
@@ -19,11 +17,12 @@ class CanadaPersonScraper(Scraper):
   """
 
   def get_people(self):
-    screen_names = json.loads(requests.get('http://scrapers-ruby.herokuapp.com/twitter_users').content)
+    screen_names = json.loads(get_session().get('http://scrapers-ruby.herokuapp.com/twitter_users').content)
 
     page = lxmlize(COUNCIL_PAGE)
     rows = page.xpath('//div[@class="main-content"]//tr')[1:]
-    for row in rows:
+    urls = [row.xpath('string(./td[1]//a/@href)') for row in rows]
+    for row, url, mp_page in zip(rows, urls, lxmlize_many(urls)):
       name_cell = row.xpath('./td[1]')[0]
       last_name = name_cell.xpath('string(.//span[1])')
       first_name = name_cell.xpath('string(.//span[2])')
@@ -32,8 +31,6 @@ class CanadaPersonScraper(Scraper):
       province = row.xpath('string(./td[3])')
       party = row.xpath('string(./td[4])')
 
-      url = name_cell.xpath('string(.//a/@href)')
-      mp_page = lxmlize(url)
       email = mp_page.xpath('string(//span[@class="caucus"]/'
                             'a[contains(., "@")])')
       photo = mp_page.xpath('string(//div[@class="profile overview header"]//'
@@ -1,11 +1,10 @@
 # coding: utf-8
-import requests
 import lxml.html
 from lxml import etree
 
 from pupa.scrape import Scraper
 
-from utils import lxmlize, CanadianLegislator as Legislator
+from utils import get_session, lxmlize, CanadianLegislator as Legislator
 
 import re
 import csv
@@ -29,7 +28,7 @@ def get_party(abbr):
 class AlbertaPersonScraper(Scraper):
 
   def get_people(self):
-    csv_text = requests.get(get_csv_url()).text
+    csv_text = get_session().get(get_csv_url()).text
     cr = csv.DictReader(csv_text.split('\n'))
     for mla in cr:
       name = '%s %s %s' % (mla['MLA First Name'], mla['MLA Middle Names'],
@@ -61,6 +60,6 @@ def get_csv_url():
     '__EVENTVALIDATION': asp_event_validation
   }
 
-  resp = requests.post(COUNCIL_PAGE, data=post_data)
+  resp = get_session().post(COUNCIL_PAGE, data=post_data)
   result_page = lxml.html.fromstring(resp.text)
   return result_page.xpath('string(//a[@id="_ctl0_HL_file"]/@href)')
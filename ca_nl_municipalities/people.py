@@ -1,15 +1,50 @@
 from pupa.scrape import Scraper
 from pupa.models import Organization
 
-from utils import lxmlize, AggregationLegislator as Legislator
+from utils import detect_columns, header_columns, http_get, lxmlize, pdf_to_text, table_rows, AggregationLegislator as Legislator
 
 import re
-import urllib2
-import os
-import subprocess
 
 COUNCIL_PAGE = 'http://www.ma.gov.nl.ca/ma/municipal_directory/index.html'
 
+FIELDS = (('district', 'Official Name'), ('name', 'Mayor'), ('phone', 'Line 1'), ('fax', 'Fax'), ('email', 'E-mail'), ('address', 'Address'))
+
+
+def header_offsets(header):
+  """
+  Returns each field's offsets from the offsets of the labels in the header.
+  """
+  fax_end = header.index('E-mail') - 2
+  email_end = header.index('Address') - 1
+  return {
+    'district': (0, header.index('Region')),
+    'name': (header.index('Mayor') + 1, header.index('Clerk') - 1),
+    'phone': (header.index('Line 1'), header.index('Line 2') - 1),
+    'fax': (header.index('Fax'), fax_end),
+    'email': (fax_end + 1, email_end),
+    'address': (email_end + 1, header.index('Days') - 1),
+  }
+
+
+def municipal_rows(page):
+  """
+  Returns each line of a page of the municipal directory as a dict from the
+  fields to their text.
+  """
+  lines = [line for line in page.splitlines() if line.strip()]
+  header = next((line for line in lines if 'Official Name' in line), None)
+  if not header:
+    return []
+  rows = [line for line in lines if line != header]
+
+  # Detect the columns once per page, and name them from the header.
+  columns, names = header_columns(header, detect_columns(lines, tolerance=0.1))
+  # If a label shares a column with another label, because a label or a value
+  # spans a gutter, use the offsets of the header's labels.
+  if not all(label in names for _, label in FIELDS):
+    offsets = header_offsets(header)
+    return [dict((key, line[start:end].strip()) for key, (start, end) in offsets.items()) for line in rows]
+  return [dict((key, row[label]) for key, label in FIELDS) for row in table_rows(rows, columns, names)]
 
 class NewfoundlandAndLabradorMunicipalitiesPersonScraper(Scraper):
 
@@ -17,40 +52,17 @@ class NewfoundlandAndLabradorMunicipalitiesPersonScraper(Scraper):
     page = lxmlize(COUNCIL_PAGE)
     url = page.xpath('//a[contains(text(),"Municipal Directory")]/@href')[0]
 
-    response = urllib2.urlopen(url).read()
-    pdf = open('/tmp/nl.pdf', 'w')
-    pdf.write(response)
-    pdf.close()
-
-    data = subprocess.check_output(['pdftotext', '-layout', '/tmp/nl.pdf', '-'])
+    response = http_get(url).content
+    data = pdf_to_text(response, layout=True)
     pages = data.split('Municipal Directory')[1:]
     for page in pages:
-      page = page.splitlines(True)
-      column_index = {}
-      for line in page:
-        if 'Official Name' in line:
-          column_index['dist_end'] = re.search('Region', line).start()
-          column_index['name_start'] = re.search('Mayor', line).start() + 1
-          column_index['name_end'] = re.search('Clerk', line).start() - 1
-          column_index['phone_start'] = re.search('Line 1', line).start()
-          column_index['phone_end'] = re.search('Line 2', line).start() - 1
-          column_index['fax_start'] = re.search('Fax', line).start()
-          column_index['fax_end'] = re.search('E-mail', line).start() - 2
-          column_index['email_start'] = column_index['fax_end'] + 1
-          column_index['email_end'] = re.search('Address', line).start() - 1
-          column_index['address_start'] = column_index['email_end'] + 1
-          column_index['address_end'] = re.search('Days', line).start() - 1
-          break
-      for line in page:
-        if 'Official Name' in line or not line.strip():
-          continue
-        district = line[:column_index['dist_end']]
-        name = line[column_index['name_start']:column_index['name_end']].strip()
-        phone = line[column_index['phone_start']:column_index['phone_end']].strip().replace('(', '').replace(') ', '-')
-        fax = line[column_index['fax_start']:column_index['fax_end']].strip().replace('(', '').replace(') ', '-')
-        email = line[column_index['email_start']:column_index['email_end']].strip()
-        address = line[column_index['address_start']:column_index['address_end']].strip()
-        address = re.sub(r'\s{2,}', ', ', address)
+      for row in municipal_rows(page):
+        district = row['district']
+        name = row['name']
+        phone = row['phone'].replace('(', '').replace(') ', '-')
+        fax = row['fax'].replace('(', '').replace(') ', '-')
+        email = row['email']
+        address = re.sub(r'\s{2,}', ', ', row['address'])
         if not name or not district:
           continue
 
@@ -73,4 +85,3 @@ class NewfoundlandAndLabradorMunicipalitiesPersonScraper(Scraper):
         if address:
           membership.add_contact_detail('address', address, 'legislature')
         yield p
-    os.system('rm /tmp/nl.pdf')
@@ -1,6 +1,6 @@
 from pupa.scrape import Scraper
 
-from utils import lxmlize, CanadianLegislator as Legislator
+from utils import lxmlize, lxmlize_many, CanadianLegislator as Legislator
 
 import re
 from urlparse import urljoin
@@ -14,7 +14,8 @@ class CapeBretonPersonScraper(Scraper):
     page = lxmlize(COUNCIL_PAGE)
 
     councillors = page.xpath('//table[@class="table_style"]/tbody/tr')[1:]
-    for councillor in councillors:
+    councillor_urls = [councillor.xpath('.//a/@href')[0] for councillor in councillors]
+    for councillor, councillor_url, page in zip(councillors, councillor_urls, lxmlize_many(councillor_urls)):
       name = councillor.xpath('.//a')[0].text_content()
       district = 'District %s' % councillor.xpath('.//strong')[0].text_content()
 
@@ -28,9 +29,7 @@ class CapeBretonPersonScraper(Scraper):
       p.add_contact('voice', phone, 'legislature')
       p.add_contact('fax', fax, 'legislature')
 
-      councillor_url = councillor.xpath('.//a/@href')[0]
       p.add_source(councillor_url)
-      page = lxmlize(councillor_url)
       p.image = page.xpath('//img[@class="image_left"]/@src')[0]
       yield p
 
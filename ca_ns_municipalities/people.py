@@ -1,12 +1,9 @@
 from pupa.scrape import Scraper
 from pupa.models import Organization
 
-from utils import lxmlize, AggregationLegislator as Legislator
+from utils import http_get, lxmlize, pdf_to_text, AggregationLegislator as Legislator
 
 import re
-import urllib2
-import os
-import subprocess
 
 COUNCIL_PAGE = 'http://www.unsm.ca/doc_download/880-mayor-list-2013'
 
@@ -14,12 +11,8 @@ COUNCIL_PAGE = 'http://www.unsm.ca/doc_download/880-mayor-list-2013'
 class NovaScotiaMunicipalitiesPersonScraper(Scraper):
 
   def get_people(self):
-    response = urllib2.urlopen(COUNCIL_PAGE).read()
-    pdf = open('/tmp/ns.pdf', 'w')
-    pdf.write(response)
-    pdf.close()
-
-    data = subprocess.check_output(['pdftotext', '/tmp/ns.pdf', '-'])
+    response = http_get(COUNCIL_PAGE).content
+    data = pdf_to_text(response)
     emails = re.findall(r'(?<=E-mail: ).+', data)
     data = re.split(r'Mayor |Warden ', data)[1:]
     for i, mayor in enumerate(data):
@@ -62,5 +55,3 @@ class NovaScotiaMunicipalitiesPersonScraper(Scraper):
         if matches:
           membership.add_contact_detail('email', emails.pop(i), None)
       yield p
-
-    os.system('rm /tmp/ns.pdf')
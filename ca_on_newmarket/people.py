@@ -1,6 +1,6 @@
 from pupa.scrape import Scraper
 
-from utils import lxmlize, CanadianLegislator as Legislator
+from utils import lxmlize, lxmlize_many, CanadianLegislator as Legislator
 
 import re
 
@@ -14,7 +14,8 @@ class NewmarketPersonScraper(Scraper):
 
     councillors = page.xpath('//div[@id="printArea"]//table//tr//td')[4:-1]
     yield self.scrape_mayor(councillors[0])
-    for councillor in councillors[1:]:
+    urls = [councillor.xpath('.//a/@href')[0] for councillor in councillors[1:]]
+    for councillor, url, page in zip(councillors[1:], urls, lxmlize_many(urls)):
       name = ' '.join(councillor.xpath('string(.//strong/a[last()])').split())
       infostr = councillor.xpath('string(.//strong)')
       try:
@@ -23,7 +24,6 @@ class NewmarketPersonScraper(Scraper):
       except IndexError:
         district = 'Newmarket'
         role = 'Regional Councillor'
-      url = councillor.xpath('.//a/@href')[0]
 
       p = Legislator(name=name, post_id=district, role=role)
       p.add_source(COUNCIL_PAGE)
@@ -31,7 +31,6 @@ class NewmarketPersonScraper(Scraper):
 
       p.image = councillor.xpath('.//img/@src')[0]
 
-      page = lxmlize(url)
       info = page.xpath('//div[@id="printArea"]')[0]
       info = info.xpath('.//p[@class="heading"][2]/following-sibling::p')
       address = info.pop(0).text_content().strip()
@@ -2,16 +2,25 @@
 from pupa.scrape import Scraper
 from pupa.models import Event
 
-from utils import lxmlize
+from utils import lxmlize, lxmlize_many
+
+from ca_on_toronto.tmmis import fetch_member_reports, fetch_report
 
-import requests
 import re
 import datetime as dt
-import csv
-import tempfile
-import shutil
+import json
 import os
 
+# Agenda items are only read from completed meetings, which don't change, so
+# each meeting's items are cached in AGENDA_ITEM_CACHE_DIR by meeting and by
+# agendaItemId. Set the AGENDA_ITEM_CACHE_DIR environment variable to an empty
+# string to disable caching.
+AGENDA_ITEM_CACHE_DIR = os.getenv('AGENDA_ITEM_CACHE_DIR', 'agenda_item_cache')
+# The number of concurrent requests to app.toronto.ca.
+PER_HOST = 2
+
+decision_bodies_memo = {}
+
 
 class TorontoEventScraper(Scraper):
 
@@ -21,193 +30,212 @@ class TorontoEventScraper(Scraper):
 
  # scrape attendance
 
-    tmpdir = tempfile.mkdtemp()
-
-    page = lxmlize("http://app.toronto.ca/tmmis/getAdminReport.do?function=prepareMemberAttendanceReport")
-    members = page.xpath('//td[@class="inputText"]/select[@name="memberId"]/option')
-    for member in members:
-      post = {
-        'function': 'getMemberAttendanceReport',
-        'download': 'csv',
-        'exportPublishReportId': 1,
-        'termId': 4,
-        'memberId': member.attrib['value'],
-        'decisionBodyId': 0,
-      }
-      r = requests.post("http://app.toronto.ca/tmmis/getAdminReport.do", data=post)
-      if r.headers['content-type'] != 'application/vnd.ms-excel':
-        continue
-
-      attendance_file = open(tmpdir + '/' + member.text + '.csv', 'w')
-      attendance_file.write(r.text)
-      attendance_file.close()
+    attendance = index_attendance(fetch_member_reports(1, 4))
 
 # scrape events
-    post = {
+    empty = []
+
+    meetings = fetch_report({
       'function': 'getMeetingScheduleReport',
       'download': 'csv',
       'exportPublishReportId': 3,
       'termId': 4,
       'decisionBodyId': 0,
-    }
-
-    r = requests.post("http://app.toronto.ca/tmmis/getAdminReport.do", data=post)
-    empty = []
-
-    meeting_file = open('meetings.csv', 'w')
-    meeting_file.write(r.text)
-    meeting_file.close()
-    with open('meetings.csv', 'rb') as csvfile:
-      csvfile = csv.reader(csvfile, delimiter=',')
-      next(csvfile)
-
-      committee = ''
-      agenda_items = []
-
-      for row in csvfile:
-        name = row[0]
-        when = row[2]
-        when = dt.datetime.strptime(when, "%Y-%m-%d")
-        location = row[5]
-
-        if name != committee:
-          committee = name
-          agenda_items = find_items(committee)
-
-        e = Event(name=name,
-                  session=self.session,
-                  when=when,
-                  location=location
-                  )
-
-        attendees = find_attendees(tmpdir, row)
-        if len(attendees) == 0:
-          empty.append(row)
-        for attendee in find_attendees(tmpdir, row):
-          e.add_person(attendee)
-        e.add_source("http://app.toronto.ca/tmmis/getAdminReport.do?function=prepareMeetingScheduleReport")
-
-        for item in agenda_items:
-          if item['date'].date() == when.date():
-            i = e.add_agenda_item(item['description'])
-            i.add_committee(committee)
-            i['order'] = item['order']
-
-            for link in item['links']:
-              i.add_media_link(link['name'], link['url'], on_duplicate='ignore')
-
-            if 'notes' in item:
-              i['notes'] = [item['notes']]
-
-        yield e
-
-    shutil.rmtree(tmpdir)
-    os.remove('meetings.csv')
-
-
-def find_attendees(directory, event):
-  # TODO
-  # go through all csv files and find members that attended the event
-  attendees = []
-  files = [f for f in os.listdir(directory)]
-  for f in files:
-    name = f.replace('.csv', '')
-    with open(directory + '/' + f, 'rb') as csvfile:
-      csvfile = csv.reader(csvfile, delimiter=',')
-      next(csvfile)
-      for row in csvfile:
-        # find the right date
-        if row[2] == event[2]:
-          if (row[0] == event[0]) and (row[1] == event[1]) and (row[5] == "Y"):
-            attendees.append(name)
-  return set(attendees)
+    }) or []
+
+    committee = ''
+    agenda_items = []
+
+    for row in meetings:
+      name = row[0]
+      when = row[2]
+      when = dt.datetime.strptime(when, "%Y-%m-%d")
+      location = row[5]
+
+      if name != committee:
+        committee = name
+        agenda_items = find_items(committee)
+
+      e = Event(name=name,
+                session=self.session,
+                when=when,
+                location=location
+                )
+
+      attendees = attendance.get(tuple(row[0:3]), set())
+      if len(attendees) == 0:
+        empty.append(row)
+      for attendee in attendees:
+        e.add_person(attendee)
+      e.add_source("http://app.toronto.ca/tmmis/getAdminReport.do?function=prepareMeetingScheduleReport")
+
+      for item in agenda_items:
+        if item['date'].date() == when.date():
+          i = e.add_agenda_item(item['description'])
+          i.add_committee(committee)
+          i['order'] = item['order']
+
+          for link in item['links']:
+            i.add_media_link(link['name'], link['url'], on_duplicate='ignore')
+
+          if 'notes' in item:
+            i['notes'] = [item['notes']]
+
+      yield e
+
+
+# map each meeting's committee, meeting type and date to the set of
+# representatives that attended it
+def index_attendance(reports):
+  attendance = {}
+  for name, rows in reports.items():
+    for row in rows:
+      if row[5] == "Y":
+        attendance.setdefault(tuple(row[0:3]), set()).add(name)
+  return attendance
+
+
+def read_cache(key):
+  if AGENDA_ITEM_CACHE_DIR:
+    try:
+      with open(os.path.join(AGENDA_ITEM_CACHE_DIR, '%s.json' % key)) as f:
+        return json.load(f)
+    except (IOError, ValueError):
+      pass
+
+
+def write_cache(key, value):
+  if AGENDA_ITEM_CACHE_DIR:
+    if not os.path.isdir(AGENDA_ITEM_CACHE_DIR):
+      try:
+        os.makedirs(AGENDA_ITEM_CACHE_DIR)
+      except OSError:  # Another process created it.
+        pass
+    path = os.path.join(AGENDA_ITEM_CACHE_DIR, '%s.json' % key)
+    tmp = '%s.%d' % (path, os.getpid())
+    with open(tmp, 'w') as f:
+      json.dump(value, f)
+    os.rename(tmp, path)
+
+
+def find_decision_body(committee):
+  if 'page' not in decision_bodies_memo:
+    decision_bodies_memo['page'] = lxmlize('http://app.toronto.ca/tmmis/decisionBodyList.do?function=prepareDisplayDBList')
+  if committee not in decision_bodies_memo:
+    link = decision_bodies_memo['page'].xpath('//table[@class="default zebra"]//a[contains(text(),"%s")]/@href' % committee)
+    decision_bodies_memo[committee] = link[0] if link else None
+  return decision_bodies_memo[committee]
 
 
 def find_items(committee):
 
   agenda_items = []
 
-  page = lxmlize('http://app.toronto.ca/tmmis/decisionBodyList.do?function=prepareDisplayDBList')
-  link = page.xpath('//table[@class="default zebra"]//a[contains(text(),"%s")]/@href' % committee)
-  if link:
-    link = link[0]
-  else:
-    return None
+  link = find_decision_body(committee)
+  if not link:
+    return agenda_items
 
+  # Find the agendaItemIds of each completed meeting.
+  meetings = []
   page = lxmlize(link)
-  meetings = page.xpath('//a[contains(@name, "header")]')
-  for meeting in meetings:
+  for meeting in page.xpath('//a[contains(@name, "header")]'):
     if not 'Complete' in meeting.xpath('./parent::h3')[0].text_content():
       continue
     date = meeting.xpath('./parent::h3')[0].text_content().strip().split('-')
     date = dt.datetime.strptime('-'.join(date[0:2]).strip(), "%B %d, %Y - %I:%M %p")
     meeting_id = meeting.attrib['name'].replace('header', '').strip()
-    # get = { 'function' : 'doPrepare', 'meetingId' : meeting_id }
-    if committee == 'City Council':
-      request_string = 'http://app.toronto.ca/tmmis/viewAgendaItemList.do?function=getCouncilAgendaItems&meetingId=%s' % meeting_id
-    else:
-      request_string = 'http://app.toronto.ca/tmmis/viewAgendaItemList.do?function=getAgendaItems&meetingId=%s' % meeting_id
-    page = lxmlize(request_string)
-
-    items = page.xpath('//tr[@class="nonUrgent" or @class="urgent"]')
-    for item in items:
-      page = lxmlize(item.xpath('.//a/@href')[0])
-      item_content_script = page.xpath('//script[contains(text(), "loadContent")]/text()')[0]
-      item_id = re.findall(r'(?<=agendaItemId:")(.*)(?=")', item_content_script)[0]
+    item_ids = read_cache('meeting-%s' % meeting_id)
+    if item_ids is None:
+      # get = { 'function' : 'doPrepare', 'meetingId' : meeting_id }
       if committee == 'City Council':
-        item_info_url = 'http://app.toronto.ca/tmmis/viewAgendaItemDetails.do?function=getCouncilMinutesItemPreview&r=1376598367685&agendaItemId=%s' % item_id
+        request_string = 'http://app.toronto.ca/tmmis/viewAgendaItemList.do?function=getCouncilAgendaItems&meetingId=%s' % meeting_id
       else:
-        item_info_url = 'http://app.toronto.ca/tmmis/viewAgendaItemDetails.do?function=getMinutesItemPreview&r=1376593612354&agendaItemId=%s' % item_id
-      page = lxmlize(item_info_url)
-
-      root_description = page.xpath('//font[@size="4"]')[0].text_content()
-      root_order = page.xpath('//table[@class="border"]//td[1]//text()')[0]
-
-      # Get background documents
-      item_links = []
-      links = page.xpath('//a[not(contains(@href, "mailto:"))]')
-      for link in links:
-        if not 'href' in link.attrib.keys():
-          continue
-        description = link.xpath('.//parent::font/preceding-sibling::font/text()')
-        if description:
-          description = description[-1]
-        else:
-          description = link.text_content()
-        item_link = {'name': description, 'url': link.attrib['href']}
-        item_links.append(item_link)
-
-      agenda_items.append({
-        'committee': committee,
-        'description': root_description,
-        'order': root_order,
-        'date': date,
-        'links': item_links,
-      })
-
-      # Read through the decisions section and create agenda items from the list
-      decisions = page.xpath('//b[contains(text(), "Decision")]/ancestor::tr/following-sibling::tr//p')
-      agenda_item = {}
-      notes = ''
-      for decision in decisions:
-        if 'style' in decision.attrib.keys() and 'MARGIN-LEFT: 1in' in decision.attrib['style']:
-          note = decision.text_content().strip()
-          notes = notes + ' ' + note
-        if not decision.text_content().strip() or not re.findall(r'[0-9]\.\W{2,}', decision.text_content()):
-          continue
-        number = re.findall(r'([0-9]{1,2})\.', decision.text_content())[0]
-        description = re.sub(r'^[0-9]{1,2}\.', '', decision.text_content()).strip()
-        order = root_order + '-' + number
-
-        agenda_item['committee'] = committee
-        agenda_item['description'] = description
-        if len(notes) > 0:
-          agenda_item['notes'] = {'description': notes}
-        agenda_item['order'] = order
-        agenda_item['date'] = date
-        agenda_item['links'] = item_links
+        request_string = 'http://app.toronto.ca/tmmis/viewAgendaItemList.do?function=getAgendaItems&meetingId=%s' % meeting_id
+      page = lxmlize(request_string)
+
+      item_ids = []
+      urls = [item.xpath('.//a/@href')[0] for item in page.xpath('//tr[@class="nonUrgent" or @class="urgent"]')]
+      for page in lxmlize_many(urls, per_host=PER_HOST):
+        item_content_script = page.xpath('//script[contains(text(), "loadContent")]/text()')[0]
+        item_ids.append(re.findall(r'(?<=agendaItemId:")(.*)(?=")', item_content_script)[0])
+      write_cache('meeting-%s' % meeting_id, item_ids)
+    meetings.append((date, item_ids))
+
+  # Fetch the agenda items that aren't cached. An item's page depends on whether
+  # it's City Council's, so its cache key includes the page's function.
+  if committee == 'City Council':
+    url = 'http://app.toronto.ca/tmmis/viewAgendaItemDetails.do?function=getCouncilMinutesItemPreview&r=1376598367685&agendaItemId=%s'
+    key = 'getCouncilMinutesItemPreview-%s'
+  else:
+    url = 'http://app.toronto.ca/tmmis/viewAgendaItemDetails.do?function=getMinutesItemPreview&r=1376593612354&agendaItemId=%s'
+    key = 'getMinutesItemPreview-%s'
+  items = {}
+  for date, item_ids in meetings:
+    for item_id in item_ids:
+      items[item_id] = read_cache(key % item_id)
+  item_ids = [item_id for item_id, value in items.items() if value is None]
+  for item_id, page in zip(item_ids, lxmlize_many([url % item_id for item_id in item_ids], per_host=PER_HOST)):
+    items[item_id] = parse_item(page)
+    write_cache(key % item_id, items[item_id])
+
+  for date, item_ids in meetings:
+    for item_id in item_ids:
+      for item in items[item_id]:
+        agenda_item = dict(item, committee=committee, date=date)
         agenda_items.append(agenda_item)
-        agenda_item = {}
-        notes = ''
+
+  return agenda_items
+
+
+# returns the agenda item and its decisions, without their committee or date
+def parse_item(page):
+
+  agenda_items = []
+
+  root_description = page.xpath('//font[@size="4"]')[0].text_content()
+  root_order = page.xpath('//table[@class="border"]//td[1]//text()')[0]
+
+  # Get background documents
+  item_links = []
+  links = page.xpath('//a[not(contains(@href, "mailto:"))]')
+  for link in links:
+    if not 'href' in link.attrib.keys():
+      continue
+    description = link.xpath('.//parent::font/preceding-sibling::font/text()')
+    if description:
+      description = description[-1]
+    else:
+      description = link.text_content()
+    item_link = {'name': description, 'url': link.attrib['href']}
+    item_links.append(item_link)
+
+  agenda_items.append({
+    'description': root_description,
+    'order': root_order,
+    'links': item_links,
+  })
+
+  # Read through the decisions section and create agenda items from the list
+  decisions = page.xpath('//b[contains(text(), "Decision")]/ancestor::tr/following-sibling::tr//p')
+  agenda_item = {}
+  notes = ''
+  for decision in decisions:
+    if 'style' in decision.attrib.keys() and 'MARGIN-LEFT: 1in' in decision.attrib['style']:
+      note = decision.text_content().strip()
+      notes = notes + ' ' + note
+    if not decision.text_content().strip() or not re.findall(r'[0-9]\.\W{2,}', decision.text_content()):
+      continue
+    number = re.findall(r'([0-9]{1,2})\.', decision.text_content())[0]
+    description = re.sub(r'^[0-9]{1,2}\.', '', decision.text_content()).strip()
+    order = root_order + '-' + number
+
+    agenda_item['description'] = description
+    if len(notes) > 0:
+      agenda_item['notes'] = {'description': notes}
+    agenda_item['order'] = order
+    agenda_item['links'] = item_links
+    agenda_items.append(agenda_item)
+    agenda_item = {}
+    notes = ''
 
   return agenda_items
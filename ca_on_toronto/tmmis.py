@@ -0,0 +1,70 @@
+# coding: utf8
+from collections import OrderedDict
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
+
+from utils import get_session, lxmlize
+
+import csv
+
+ADMIN_REPORT_URL = 'http://app.toronto.ca/tmmis/getAdminReport.do'
+
+# Maps an exportPublishReportId to the functions that prepare and get the report.
+MEMBER_REPORTS = {
+  1: ('prepareMemberAttendanceReport', 'getMemberAttendanceReport'),
+  2: ('prepareMemberVoteReport', 'getMemberVoteReport'),
+}
+
+# The number of concurrent requests to app.toronto.ca.
+WORKERS = 4
+
+
+def read_report(response):
+  csvfile = csv.reader(StringIO(response.text.encode('utf-8').strip()), delimiter=',')
+  # An empty report has no header.
+  if next(csvfile, None) is None:
+    return []
+  return list(csvfile)
+
+
+def fetch_report(post):
+  """
+  Returns a report's rows, without its header, or None if it has no rows.
+  """
+  r = get_session().post(ADMIN_REPORT_URL, data=post)
+  if r.headers['content-type'] != 'application/vnd.ms-excel':
+    return None
+  return read_report(r)
+
+
+def fetch_member_reports(report_id, term_id):
+  """
+  Fetches a report for each member of council, concurrently, and returns an
+  ordered dict of members' names to their reports' rows.
+  """
+  prepare_function, function = MEMBER_REPORTS[report_id]
+  page = lxmlize('%s?function=%s' % (ADMIN_REPORT_URL, prepare_function))
+  members = page.xpath('//td[@class="inputText"]/select[@name="memberId"]/option')
+
+  def fetch(member):
+    return fetch_report({
+      'function': function,
+      'download': 'csv',
+      'exportPublishReportId': report_id,
+      'termId': term_id,
+      'memberId': member.attrib['value'],
+      'decisionBodyId': 0,
+    })
+
+  pool = ThreadPool(WORKERS)
+  try:
+    rows = pool.map(fetch, members)
+  finally:
+    pool.close()
+    pool.join()
+
+  reports = OrderedDict()
+  for member, member_rows in zip(members, rows):
+    if member_rows is not None:
+      reports[member.text] = member_rows
+  return reports
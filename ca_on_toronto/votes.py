@@ -2,110 +2,110 @@
 from pupa.scrape import Scraper
 from pupa.models import Vote
 
-from utils import lxmlize
-import requests
-import re
-import csv
-import tempfile
-import shutil
+from collections import OrderedDict
+
+from ca_on_toronto.tmmis import fetch_member_reports
+
+import json
 import os
 
 VOTES = {'Yes': 'yes', 'No': 'no', 'Absent': 'not-voting'}
 
+TERM_ID = 4
+
+# The votes emitted by each run are stored in VOTE_STORE_DIR, with the latest
+# vote date of each term. Set the TORONTO_VOTES_EXPORT environment variable to
+# re-emit all stored votes without scraping.
+VOTE_STORE_DIR = os.getenv('VOTE_STORE_DIR', 'vote_store')
+
 
 class TorontoVoteScraper(Scraper):
 
   def get_votes(self):
     # org.add_source("http://app.toronto.ca/tmmis/getAdminReport.do?function=prepareMemberVoteReport")
 
-    tmpdir = tempfile.mkdtemp()
-    download_files(tmpdir)
-
-    # read through each csv file
-    files = [f for f in os.listdir(tmpdir)]
-    for f in files:
-
-      name = f.replace('.csv', '')
-
-      with open(tmpdir + '/' + f, 'rb') as csvfile:
-        csvfile = csv.reader(csvfile, delimiter=',')
-        next(csvfile)
-
-        for row in csvfile:
-          session = self.session
-          date = row[1].split()[0]
-          v_type = 'other'
-          passed = 'Carried' in row[6]
-          if not 'tie' in row[6]:
-            yes_count, no_count = row[6].split()[1].split('-')
-          else:
-            yes_count, no_count = 1, 1
-          motion = row[3].replace('\xc4', '').replace('\xc2', '')
-          vote = Vote(self.jurisdiction.division_name, session, date, motion, v_type, passed, int(yes_count), int(no_count))
-          vote.vote(name, VOTES[row[5]])
-          scan_files(tmpdir, f, vote, row)
-          vote.add_source("http://app.toronto.ca/tmmis/getAdminReport.do")
-          yield vote
-      os.remove(tmpdir + '/' + f)
-    shutil.rmtree(tmpdir)
-
-
-def download_files(dest_directory):
+    store = read_store(TERM_ID)
+    if os.getenv('TORONTO_VOTES_EXPORT'):
+      for rows in store['votes']:
+        yield self.build_vote(rows)
+      return
+
+    # Votes are only ever appended, so skip the votes before the last run's
+    # latest vote, and the votes on that date that were already emitted.
+    emitted = set(vote_key(rows[0][1]) for rows in store['votes'])
+    for key, rows in index_votes(download_files()).items():
+      date = rows[0][1][1].split()[0]
+      if store['watermark'] and date < store['watermark'] or key in emitted:
+        continue
+      yield self.build_vote(rows)
+      store['votes'].append(rows)
+      store['watermark'] = max(date, store['watermark'])
+    write_store(TERM_ID, store)
+
+  def build_vote(self, rows):
+    name, row = rows[0]
+    session = self.session
+    date = row[1].split()[0]
+    v_type = 'other'
+    passed = 'Carried' in row[6]
+    if not 'tie' in row[6]:
+      yes_count, no_count = row[6].split()[1].split('-')
+    else:
+      yes_count, no_count = 1, 1
+    motion = row[3].replace('\xc4', '').replace('\xc2', '')
+    vote = Vote(self.jurisdiction.division_name, session, date, motion, v_type, passed, int(yes_count), int(no_count))
+    for name, row in rows:
+      vote.vote(name, VOTES[row[5]])
+    vote.add_source("http://app.toronto.ca/tmmis/getAdminReport.do")
+    return vote
+
+
+def download_files():
   "http://app.toronto.ca/tmmis/getAdminReport.do?function=prepareMemberVoteReport"
-  page = lxmlize("http://app.toronto.ca/tmmis/getAdminReport.do?function=prepareMemberVoteReport")
-
-  # download csv files
-  members = page.xpath('//td[@class="inputText"]/select[@name="memberId"]/option')
-  for member in members[1:3]:
-
-    post = {
-        'function': 'getMemberVoteReport',
-        'download': 'csv',
-        'exportPublishReportId': 2,
-        'termId': 4,
-        'memberId': member.attrib['value'],
-        'decisionBodyId': 0,
-
-    }
-
-    r = requests.post("http://app.toronto.ca/tmmis/getAdminReport.do", data=post)
-    if r.headers['content-type'] != 'application/vnd.ms-excel':
-      continue
-
-    name = member.text
+  reports = OrderedDict()
+  for name, rows in fetch_member_reports(2, TERM_ID).items():
     if name == "Norman Kelly":
       name = "Norm Kelly"
     if "Ana Bail" in name:
       name = "Ana Bailao"
-
-    print 'downloading ' + name
-
-    vote_file = open(dest_directory + '/' + name + '.csv', 'w')
-    vote_file.write(r.text.encode('utf-8').strip())
-    vote_file.close()
-
-
-# scan csv files of other representatives for matching votes
-# adding representatives to Vote object
-# delete matching rows in other files
-def scan_files(directory, current_file, vote, vote_row):
-  files = [f for f in os.listdir(directory)]
-  for f in files:
-    if f == current_file:
-      continue
-    name = f.replace('.csv', '')
-    tempfile_target = open(directory + '/temp.csv', 'wb')
-    tempfile = csv.writer(tempfile_target)
-    with open(directory + '/' + f, 'r+') as csvfile:
-      csvfile = csv.reader(csvfile, delimiter=',')
-      for row in csvfile:
-        row_description = row[2:5] + row[6:8]
-        vote_description = vote_row[2:5] + vote_row[6:8]
-        if (row_description == vote_description):
-          vote.vote(name, VOTES[row[5]])
-        else:
-          tempfile.writerow(row)
-      tempfile_target.close()
-
-    os.remove(directory + '/' + f)
-    os.rename(directory + '/temp.csv', directory + '/' + f)
+    reports[name] = rows
+  return reports
+
+
+# group the representatives' rows by vote, in the order in which the votes
+# first appear, so that each Vote object is built with all its ballots at once
+def index_votes(reports):
+  index = OrderedDict()
+  for name, rows in reports.items():
+    for row in rows:
+      index.setdefault(vote_key(row), []).append((name, row))
+  return index
+
+
+def vote_key(row):
+  return tuple(row[2:5] + row[6:8])
+
+
+def read_store(term_id):
+  """
+  Returns the term's latest vote date, as `watermark`, and its stored votes, as
+  lists of `(name, row)` ballots.
+  """
+  try:
+    with open(os.path.join(VOTE_STORE_DIR, 'term-%d.json' % term_id)) as f:
+      store = json.load(f)
+  except (IOError, ValueError):
+    return {'watermark': None, 'votes': []}
+  # The rows are parsed as UTF-8 byte strings.
+  store['votes'] = [[(name, [value.encode('utf-8') for value in row]) for name, row in rows] for rows in store['votes']]
+  return store
+
+
+def write_store(term_id, store):
+  if not os.path.isdir(VOTE_STORE_DIR):
+    os.makedirs(VOTE_STORE_DIR)
+  path = os.path.join(VOTE_STORE_DIR, 'term-%d.json' % term_id)
+  tmp = '%s.%d' % (path, os.getpid())
+  with open(tmp, 'w') as f:
+    json.dump(store, f)
+  os.rename(tmp, path)
@@ -1,7 +1,7 @@
 # coding: utf-8
 from pupa.scrape import Scraper
 
-from utils import lxmlize, CanadianLegislator as Legislator
+from utils import lxmlize, lxmlize_many, CanadianLegislator as Legislator
 
 import re
 
@@ -12,13 +12,13 @@ class QuebecPersonScraper(Scraper):
 
   def get_people(self):
     page = lxmlize(COUNCIL_PAGE)
-    for row in page.xpath('//*[@id="ListeDeputes"]/tbody/tr'):
+    rows = page.xpath('//*[@id="ListeDeputes"]/tbody/tr')
+    detail_urls = [row[0][0].attrib['href'] for row in rows]
+    for row, detail_url, detail_page in zip(rows, detail_urls, lxmlize_many(detail_urls)):
       name_comma, division = [cell.xpath('string(.)') for cell in row[:2]]
       name = ' '.join(reversed(name_comma.strip().split(',')))
       party = row[2].text_content()
       email = row[3].xpath('string(.//a/@href)').replace('mailto:', '')
-      detail_url = row[0][0].attrib['href']
-      detail_page = lxmlize(detail_url)
       photo_url = detail_page.xpath('string(//img[@class="photoDepute"]/@src)')
       division = division.replace(u'–', u'—')  # n-dash, m-dash
       p = Legislator(name=name, post_id=division, role='MNA', 
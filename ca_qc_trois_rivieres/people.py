@@ -1,10 +1,9 @@
 # coding: utf-8
 from pupa.scrape import Scraper
 
-from utils import lxmlize, CanadianLegislator as Legislator
+from utils import get_session, lxmlize, CanadianLegislator as Legislator
 from urlparse import urljoin
 
-import requests
 import re
 
 COUNCIL_PAGE = 'http://laville.v3r.net/portail/index.aspx?sect=0&module=5&module2=1&MenuID=150&CPage=1'
@@ -23,7 +22,7 @@ class TroisRivieresPersonScraper(Scraper):
     p.add_source(MAYOR_URL)
     yield p
 
-    resp = requests.get(COUNCIL_PAGE)
+    resp = get_session().get(COUNCIL_PAGE)
     # page rendering through JS on the client
     page_re = re.compile(r'createItemNiv3.+"District (.+?)".+(index.+)\\"')
     for district, url_rel in page_re.findall(resp.text):
@@ -1,26 +1,34 @@
 from pupa.scrape import Scraper
 from pupa.models import Organization
 
-from utils import lxmlize, AggregationLegislator as Legislator
+from utils import clean_address, clean_telephone_numbers, detect_columns, http_get, lxmlize, pdf_to_text, split_columns, AggregationLegislator as Legislator
 
 import re
-import urllib2
-import os
-import subprocess
 
 COUNCIL_PAGE = 'http://www.municipal.gov.sk.ca/Programs-Services/Municipal-Directory-pdf'
 # See also HTML format http://www.mds.gov.sk.ca/apps/Pub/MDS/welcome.aspx
 
 
+def split_districts(page):
+  """
+  Splits a page's lines into the lines of each of its districts. A page has up
+  to two districts side by side.
+  """
+  columns = detect_columns(page, min_gap=6, count=2)
+  if len(columns) < 2:
+    # Fall back to the gap between the districts in the first line.
+    match = re.search(r'\S(\s{6,})\S', page[0])
+    if match:
+      columns = [(0, match.end(1) - 1), (match.end(1) - 1, None)]
+  rows = [split_columns(line, columns) for line in page]
+  return map(list, zip(*rows))
+
+
 class SaskatchewanMunicipalitiesPersonScraper(Scraper):
 
   def get_people(self):
-    response = urllib2.urlopen(COUNCIL_PAGE).read()
-    pdf = open('/tmp/sk.pdf', 'w')
-    pdf.write(response)
-    pdf.close()
-
-    data = subprocess.check_output(['pdftotext', '-layout', '/tmp/sk.pdf', '-'])
+    response = http_get(COUNCIL_PAGE).content
+    data = pdf_to_text(response, layout=True)
 
     data = data.splitlines(True)
     pages = []
@@ -34,18 +42,7 @@ class SaskatchewanMunicipalitiesPersonScraper(Scraper):
 
     districts = []
     for page in pages:
-      index = re.search(r'(\s{6,})', page[0])
-      if index:
-        index = index.end() - 1
-      else:
-        index = -1
-      dist1 = []
-      dist2 = []
-      for line in page:
-        dist1.append(line[:index].strip())
-        dist2.append(line[index:].strip())
-      districts.append(dist1)
-      districts.append(dist2)
+      districts.extend(split_districts(page))
 
     for district in districts:
 
@@ -71,7 +68,7 @@ class SaskatchewanMunicipalitiesPersonScraper(Scraper):
             contacts['email'] = email
         if 'Address' in line and line.split(':')[1].strip():
           address = line.split(':')[1].strip() + ', ' + ', '.join(district[i + 1:]).replace(' ,', '')
-          contacts['address'] = address
+          contacts['address'] = clean_address(address)
         if 'Mayor' in line or 'Councillor' in line or 'Alderman' in line:
           councillor = line.split(':')[1].replace('Mr.', '').replace('Mrs.', '').replace('Ms.', '').replace('His Worship', '').replace('Her Worship', '').strip()
           role = line.split(':')[0].strip()
@@ -80,6 +77,9 @@ class SaskatchewanMunicipalitiesPersonScraper(Scraper):
 
       if not councillors:
         continue
+      numbers = [key for key in ('voice', 'fax') if key in contacts]
+      for key, (value, _) in zip(numbers, clean_telephone_numbers([contacts[key] for key in numbers])):
+        contacts[key] = value
       yield org
       for councillor in councillors:
         p = Legislator(name=councillor[0], post_id=district_name)
@@ -89,4 +89,3 @@ class SaskatchewanMunicipalitiesPersonScraper(Scraper):
         for key, value in contacts.iteritems():
           membership.add_contact_detail(key, value, None if key == 'email' else 'legislature')
         yield p
-    os.system('rm /tmp/sk.pdf')
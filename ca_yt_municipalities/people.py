@@ -1,25 +1,33 @@
 from pupa.scrape import Scraper
 from pupa.models import Organization
 
-from utils import lxmlize, AggregationLegislator as Legislator
+from utils import clean_address, clean_telephone_numbers, detect_columns, http_get, lxmlize, pdf_to_text, AggregationLegislator as Legislator
 
 import re
-import urllib2
-import os
-import subprocess
 
 COUNCIL_PAGE = 'http://www.community.gov.yk.ca/pdf/loc_govdir.pdf'
 
 
+def name_column(lines):
+  """
+  Returns the offsets at which a municipality's column of names starts and
+  ends, or None if they can't be found.
+  """
+  columns = detect_columns(lines, count=3)
+  if len(columns) == 3:
+    return columns[1]
+  # Fall back to the offsets of the names and contact details in the first line.
+  name = re.search(r'\S\s{2,}(\w)', lines[0])
+  contact = re.search(r':\s{2,}(\w)', lines[0])
+  if name and contact:
+    return name.start(1), contact.start(1)
+
+
 class YukonMunicipalitiesPersonScraper(Scraper):
 
   def get_people(self):
-    response = urllib2.urlopen(COUNCIL_PAGE).read()
-    pdf = open('/tmp/yt.pdf', 'w')
-    pdf.write(response)
-    pdf.close()
-
-    data = subprocess.check_output(['pdftotext', '-layout', '/tmp/yt.pdf', '-'])
+    response = http_get(COUNCIL_PAGE).content
+    data = pdf_to_text(response, layout=True)
     data = re.split(r'\n\s*\n', data)
     for municipality in data:
 
@@ -30,15 +38,18 @@ class YukonMunicipalitiesPersonScraper(Scraper):
         lines.pop(0)
         if not lines[0].strip():
           lines.pop(0)
-      col1end = re.search(r'\s{2,}(\w)', lines[0].strip()).end()
-      col2end = re.search(r':\s{2,}(\w)', lines[0].strip()).end()
+      # The district and address, the names, and the contact details.
+      columns = name_column(lines)
+      if not columns:
+        continue
+      col1end, col2end = columns
 
       if 'Council' in lines[1]:
-        address = lines[2][:col1end - 1].strip() + ' ' + lines[3][:col1end - 1].strip()
-        district = lines[0][:col1end - 1].strip() + ' ' + lines[1][:col1end - 1].strip()
+        address = lines[2][:col1end].strip() + ' ' + lines[3][:col1end].strip()
+        district = lines[0][:col1end].strip() + ' ' + lines[1][:col1end].strip()
       else:
-        address = lines[1][:col1end - 1].strip() + ' ' + lines[2][:col1end - 1].strip()
-        district = lines[0][:col1end - 1].strip()
+        address = lines[1][:col1end].strip() + ' ' + lines[2][:col1end].strip()
+        district = lines[0][:col1end].strip()
 
       organization = Organization(name=district + ' Council', classification='legislature', jurisdiction_id=self.jurisdiction.jurisdiction_id)
       organization.add_source(COUNCIL_PAGE)
@@ -53,6 +64,9 @@ class YukonMunicipalitiesPersonScraper(Scraper):
       if 'Website' in municipality:
         website = re.findall(r'((http:\/\/|www.)(\S*))', municipality)[0][0]
 
+      # Normalize the municipality's numbers once, for all its councillors.
+      (phone, _), (fax, _) = clean_telephone_numbers([phone, fax or ''])
+
       councillor_or_mayor = False
       for line in lines:
         if 'Mayor:' in line:
@@ -64,13 +78,13 @@ class YukonMunicipalitiesPersonScraper(Scraper):
           role = 'Councillor'
           continue
         if councillor_or_mayor:
-          councillor = line[col1end - 1:col2end - 1].strip()
+          councillor = line[col1end:col2end].strip()
           if not councillor:
             continue
           p = Legislator(name=councillor, post_id=district)
           p.add_source(COUNCIL_PAGE)
           membership = p.add_membership(organization, role=role, post_id=district)
-          membership.add_contact_detail('address', address, 'legislature')
+          membership.add_contact_detail('address', clean_address(address), 'legislature')
           membership.add_contact_detail('voice', phone, 'legislature')
           membership.add_contact_detail('email', email, None)
           if fax:
@@ -78,5 +92,3 @@ class YukonMunicipalitiesPersonScraper(Scraper):
           if website:
             p.add_link(website, None)
           yield p
-
-    os.system('rm /tmp/yt.pdf')
@@ -0,0 +1,81 @@
+# coding: utf-8
+"""
+Loads the names, subdivisions and styles of address in constants.py from a
+marshalled copy, which is rebuilt whenever constants.py changes. Loading the
+copy is faster than executing constants.py's ~20,000 statements, and it is
+only loaded the first time a value is validated, not when `patch` is imported.
+
+To rebuild the marshalled copy:
+
+    invoke constants
+"""
+import marshal
+import os
+
+directory = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(directory, 'constants.py')
+INDEX_PATH = os.path.join(directory, 'constants.marshal')
+
+index_memo = {}
+
+
+class SubdivisionSets(dict):
+  """
+  Maps a division's identifier to a frozenset of its subdivisions' names. Each
+  frozenset is built the first time its division is looked up.
+  """
+
+  def __init__(self, subdivisions):
+    self.subdivisions = subdivisions
+
+  def __missing__(self, division_id):
+    value = self[division_id] = frozenset(self.subdivisions[division_id])
+    return value
+
+
+def compile_index():
+  import constants
+  return {
+    'names': constants.names,
+    'subdivisions': constants.subdivisions,
+    'styles': constants.styles,
+  }
+
+
+def build(path=INDEX_PATH):
+  """
+  Writes the marshalled copy of constants.py.
+  """
+  index = compile_index()
+  # Write to a temporary file, in case other processes are reading the index.
+  tmp = '%s.%d' % (path, os.getpid())
+  with open(tmp, 'wb') as f:
+    marshal.dump(index, f)
+  os.rename(tmp, path)
+  return index
+
+
+def read(path=INDEX_PATH):
+  if os.path.getmtime(path) < os.path.getmtime(SOURCE_PATH):
+    raise IOError('%s is older than %s' % (path, SOURCE_PATH))
+  with open(path, 'rb') as f:
+    return marshal.load(f)
+
+
+def load():
+  """
+  Returns a dict of `names`, `subdivisions` (ordered lists of names, for error
+  messages), `subdivision_sets` (frozensets of names, for membership tests) and
+  `styles`.
+  """
+  if not index_memo:
+    try:
+      index = read()
+    except (EOFError, IOError, OSError, TypeError, ValueError):  # Missing, stale, or from another Python version.
+      try:
+        index = build()
+      except (IOError, OSError):  # Read-only directory.
+        index = compile_index()
+    index['subdivision_sets'] = SubdivisionSets(index['subdivisions'])
+    index_memo.update(index)
+  return index_memo
@@ -0,0 +1,184 @@
+# coding: utf-8
+"""
+Records the HTTP and FTP responses that scrapers receive, and replays them
+without network access, to benchmark and test scrapers offline.
+
+Set the HTTP_FIXTURES environment variable to `record` or `replay`. Responses
+are stored in HTTP_FIXTURES_DIR, in a directory per jurisdiction: each body is
+stored once, in a file named by its SHA-1, and `index.jsonl` maps each request
+to its response's status, headers, URL and body. A request is identified by its
+method, URL and body. If a request is repeated while recording, the last
+response is replayed.
+"""
+from cStringIO import StringIO
+import hashlib
+import io
+import json
+import mimetools
+import os
+import threading
+import urllib
+import urllib2
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+MODE = os.getenv('HTTP_FIXTURES', '')
+FIXTURES_DIR = os.getenv('HTTP_FIXTURES_DIR', 'fixtures')
+
+if MODE not in ('', 'record', 'replay'):
+  raise ValueError("HTTP_FIXTURES must be 'record' or 'replay', not %r" % MODE)
+
+# The module name of the jurisdiction being scraped. Set by CanadianJurisdiction.
+jurisdiction = None
+
+
+class FixtureStore(object):
+
+  def __init__(self, directory):
+    self.directory = directory
+    self.lock = threading.Lock()
+    self.indices = {}
+
+  def key(self, method, url, body=None):
+    if isinstance(url, unicode):
+      url = url.encode('utf-8')
+    if isinstance(body, unicode):
+      body = body.encode('utf-8')
+    return hashlib.sha1('%s %s\n%s' % (method.upper(), url, body or '')).hexdigest()
+
+  def index(self, name):
+    if name not in self.indices:
+      index = {}
+      try:
+        with open(os.path.join(self.directory, name, 'index.jsonl')) as f:
+          for line in f:
+            entry = json.loads(line)
+            index[entry['key']] = entry
+      except IOError:
+        pass
+      self.indices[name] = index
+    return self.indices[name]
+
+  def record(self, method, url, body, status, headers, final_url, content):
+    name = jurisdiction or 'default'
+    directory = os.path.join(self.directory, name)
+    digest = hashlib.sha1(content).hexdigest()
+    entry = {
+      'key': self.key(method, url, body),
+      'method': method.upper(),
+      'url': url,
+      'status': status,
+      'headers': dict(headers),
+      'final_url': final_url,
+      'body': digest,
+    }
+    with self.lock:
+      if not os.path.isdir(directory):
+        os.makedirs(directory)
+      path = os.path.join(directory, digest)
+      if not os.path.exists(path):
+        tmp = '%s.%d' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+          f.write(content)
+        os.rename(tmp, path)
+      with open(os.path.join(directory, 'index.jsonl'), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+      self.index(name)[entry['key']] = entry
+
+  def replay(self, method, url, body=None):
+    """
+    Returns the recorded response's entry and body, or raises IOError.
+    """
+    name = jurisdiction or 'default'
+    with self.lock:
+      entry = self.index(name).get(self.key(method, url, body))
+    if entry is None:
+      raise IOError('No fixture for %s %s in %s' % (method.upper(), url, os.path.join(self.directory, name)))
+    with open(os.path.join(self.directory, name, entry['body']), 'rb') as f:
+      return entry, f.read()
+
+
+class ReplayedBody(io.BytesIO):
+
+  """
+  The `raw` body of a replayed response. requests closes a response by
+  releasing its connection, e.g. when following a redirect.
+  """
+
+  def release_conn(self):
+    pass
+
+
+store = FixtureStore(FIXTURES_DIR)
+
+adapter_send = HTTPAdapter.send
+urlopen = urllib2.urlopen
+
+
+def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+  if MODE == 'record':
+    response = adapter_send(self, request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+    store.record(request.method, request.url, request.body, response.status_code, response.headers, response.url, response.content)
+    return response
+
+  try:
+    entry, content = store.replay(request.method, request.url, request.body)
+  except IOError as e:
+    raise requests.ConnectionError(str(e))
+  response = requests.Response()
+  response.status_code = entry['status']
+  response.headers = CaseInsensitiveDict(entry['headers'])
+  response.encoding = get_encoding_from_headers(response.headers)
+  response.url = entry['final_url']
+  response.raw = ReplayedBody(content)
+  # The body is already decoded, so requests must not read or decode it again.
+  response._content = content
+  response._content_consumed = True
+  response.request = request
+  response.connection = self
+  return response
+
+
+def fixture_urlopen(url, data=None, *args, **kwargs):
+  if isinstance(url, urllib2.Request):
+    method, full_url, data = url.get_method(), url.get_full_url(), url.get_data()
+  else:
+    method, full_url = 'POST' if data else 'GET', url
+
+  if MODE == 'record':
+    response = urlopen(url, data, *args, **kwargs)
+    content = response.read()
+    headers = dict(response.info().items())
+    store.record(method, full_url, data, response.getcode(), headers, response.geturl(), content)
+    status, final_url = response.getcode(), response.geturl()
+  else:
+    entry, content = store.replay(method, full_url, data)
+    headers, status, final_url = entry['headers'], entry['status'], entry['final_url']
+
+  message = mimetools.Message(StringIO(''.join('%s: %s\r\n' % item for item in headers.items())))
+  return urllib.addinfourl(StringIO(content), message, final_url, status)
+
+
+def iter_content(url, retrieve):
+  """
+  Records or replays an FTP download, given its URL and a function that returns
+  an iterator of its content's chunks.
+  """
+  if MODE == 'record':
+    content = ''.join(retrieve())
+    store.record('RETR', url, None, None, {}, url, content)
+  else:
+    content = store.replay('RETR', url)[1]
+  yield content
+
+
+def install():
+  """
+  Routes requests' and urllib2's requests through the fixture store.
+  """
+  if MODE:
+    HTTPAdapter.send = send
+    urllib2.urlopen = fixture_urlopen
@@ -0,0 +1,146 @@
+# coding: utf-8
+"""
+Records what the shared helpers in utils do while a jurisdiction's people are
+scraped, and logs a summary when the scraper's `get_people` finishes:
+
+* `lxmlize`: pages, bytes, HTTP time, parse time, redirects and meta refreshes
+* `CanadianLegislator.add_contact`: contact details, by type and outcome
+* `CanadianLegislator.add_link`: links, by outcome
+* `csv_reader`: files, rows and bytes
+
+Set the SCRAPER_INSTRUMENTATION environment variable to enable it. Set the
+SCRAPER_TRACE_DIR environment variable to also write a Chrome trace of each
+jurisdiction's pages and CSV files, which can be opened at chrome://tracing.
+"""
+from collections import defaultdict
+import json
+import logging
+import os
+import threading
+import time
+
+ENABLED = bool(os.getenv('SCRAPER_INSTRUMENTATION'))
+TRACE_DIR = os.getenv('SCRAPER_TRACE_DIR', '')
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder(object):
+
+  def __init__(self, jurisdiction):
+    self.jurisdiction = jurisdiction
+    self.lock = threading.Lock()
+    self.start = time.time()
+    self.counts = defaultdict(int)
+    self.times = defaultdict(float)
+    self.contact_outcomes = defaultdict(int)
+    self.link_outcomes = defaultdict(int)
+    self.events = []
+
+  def event(self, name, category, start, duration, **args):
+    if TRACE_DIR:
+      self.events.append({
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': int((start - self.start) * 1e6),
+        'dur': int(duration * 1e6),
+        'pid': os.getpid(),
+        'tid': threading.current_thread().ident,
+        'args': args,
+      })
+
+  def page(self, url, size, start, http_time, parse_time, redirects, refresh):
+    with self.lock:
+      self.counts['pages'] += 1
+      self.counts['page_bytes'] += size
+      self.counts['redirects'] += redirects
+      self.counts['meta_refreshes'] += refresh
+      self.times['http'] += http_time
+      self.times['parse'] += parse_time
+      self.event('fetch', 'lxmlize', start, http_time, url=url, bytes=size, redirects=redirects)
+      self.event('parse', 'lxmlize', start + http_time, parse_time, url=url, meta_refresh=refresh)
+
+  def contact(self, type, outcome):
+    with self.lock:
+      self.contact_outcomes['%s %s' % (type, outcome)] += 1
+
+  def link(self, outcome):
+    with self.lock:
+      self.link_outcomes[outcome] += 1
+
+  def csv(self, url, start, rows, size):
+    with self.lock:
+      self.counts['csv_files'] += 1
+      self.counts['csv_rows'] += rows
+      self.counts['csv_bytes'] += size
+      self.event('csv_reader', 'csv_reader', start, time.time() - start, url=url, rows=rows, bytes=size)
+
+  def summary(self):
+    return {
+      'jurisdiction': self.jurisdiction,
+      'time': round(time.time() - self.start, 3),
+      'counts': dict(self.counts),
+      'times': {key: round(value, 3) for key, value in self.times.items()},
+      'contact_details': dict(self.contact_outcomes),
+      'links': dict(self.link_outcomes),
+    }
+
+  def finish(self):
+    summary = self.summary()
+    logger.info('%s: %s' % (self.jurisdiction, json.dumps(summary, sort_keys=True)))
+    if TRACE_DIR:
+      if not os.path.isdir(TRACE_DIR):
+        os.makedirs(TRACE_DIR)
+      self.event('get_people', 'scraper', self.start, time.time() - self.start, **summary['counts'])
+      with open(os.path.join(TRACE_DIR, '%s.json' % self.jurisdiction), 'w') as f:
+        json.dump({'traceEvents': self.events}, f)
+    return summary
+
+
+# The recorder of the jurisdiction whose people are being scraped.
+recorder = Recorder(None)
+
+
+def instrument_scraper(scraper_class, jurisdiction):
+  """
+  Returns a subclass of the people scraper class that records the scrape and
+  logs a summary when `get_people` finishes.
+  """
+  get_people = scraper_class.get_people
+
+  def instrumented_get_people(self):
+    global recorder
+    recorder = Recorder(jurisdiction)
+    try:
+      for obj in get_people(self):
+        yield obj
+    finally:
+      recorder.finish()
+
+  return type(scraper_class.__name__, (scraper_class,), {'get_people': instrumented_get_people})
+
+
+def count_csv(url, chunks):
+  """
+  Wraps a CSV file's chunks to count its bytes, and returns the wrapped chunks
+  and a function that wraps the CSV file's rows to record the file once read.
+  """
+  start = time.time()
+  size = [0]
+
+  def counted_chunks():
+    for chunk in chunks:
+      size[0] += len(chunk)
+      yield chunk
+
+  def counted_rows(rows):
+    count = 0
+    try:
+      for row in rows:
+        count += 1
+        yield row
+    finally:
+      recorder.csv(url, start, count, size[0])
+
+  return counted_chunks(), counted_rows
@@ -1,14 +1,16 @@
 # coding: utf-8
-from copy import deepcopy
+from collections import defaultdict
+from copy import copy, deepcopy
 
 import regex as re
 from pupa.models.utils import DatetimeValidator
+from validictory.validator import SchemaError, SchemaValidator
 from pupa.models.schemas.common import contact_details as _contact_details, links as _links, sources as _sources
 from pupa.models.schemas.person import schema as person_schema
 from pupa.models.schemas.membership import schema as membership_schema
 from pupa.models.schemas.organization import schema as organization_schema
 
-from constants import names, subdivisions, styles
+import constants_index
 
 _contact_details['items']['properties']['type']['blank'] = False
 _contact_details['items']['properties']['type']['enum'] = [
@@ -54,28 +56,30 @@ person_contact_details = deepcopy(_contact_details)
 person_links = deepcopy(_links)
 
 social_re = re.compile(r'(?:facebook|twitter|youtube)\.com')
-facebook_re = re.compile(r'facebook\.com')
-twitter_re = re.compile(r'twitter\.com')
-youtube_re = re.compile(r'youtube\.com')
+jurisdiction_suffix_re = re.compile(r'\/(?:council|legislature)\Z')
+wards_re = re.compile(r'\AWards \d(?:(?:,| & | and )\d+)+\Z')
 
+# maxMatchingItems takes a function that returns an item's key, and a list of
+# rules. Each rule is the maximum number of items, a function that tests an
+# item's key, and an error message. Items are counted by key in a single pass.
 matchers = [
-  (0, lambda x: x['type'] == 'email' and x['note'] is not None,
+  (0, lambda key: key[0] == 'email' and key[1] is not None,
     'Membership has email with non-empty note'),
-  (0, lambda x: x['type'] != 'email' and x['note'] is None,
+  (0, lambda key: key[0] != 'email' and key[1] is None,
     'Membership has non-email with empty note'),
-  (1, lambda x: x['type'] == 'email',
+  (1, lambda key: key[0] == 'email',
     'Membership has many emails'),
 ]
 
-for type in ('address', 'cell', 'fax', 'voice'):
+for contact_type in ('address', 'cell', 'fax', 'voice'):
   for note in ('constituency', 'legislature', 'office', 'residence'):
-    matchers.append((1, lambda x, type=type, note=note: x['type'] == type and x['note'] == note,
+    matchers.append((1, lambda key, contact_type=contact_type, note=note: key == (contact_type, note),
       'Membership has contact_details with same type and note'))
 
 # A membership should not have notes on emails, should have notes on non-emails,
 # should have at most one email, and should, in most cases, have at most one of
 # each combination of type and note.
-membership_contact_details['maxMatchingItems'] = matchers
+membership_contact_details['maxMatchingItems'] = (lambda x: (x['type'], x['note']), matchers)
 # A membership should not have links.
 membership_links['maxItems'] = 0
 # An organization should not have contact details.
@@ -88,20 +92,20 @@ person_contact_details['maxItems'] = 0
 person_links['items']['properties']['note']['type'] = 'null'
 # A person should have, in most cases, at most one non-social media link, and
 # should have at most one link per social media website.
-person_links['maxMatchingItems'] = [
-  (1, lambda x: not social_re.search(x['url']),
+person_links['maxMatchingItems'] = (lambda x: tuple(sorted(set(social_re.findall(x['url'])))), [
+  (1, lambda sites: not sites,
     'Person has many non-social media links'),
-  (1, lambda x: facebook_re.search(x['url']),
+  (1, lambda sites: 'facebook.com' in sites,
     'Person has many facebook.com links'),
-  (1, lambda x: twitter_re.search(x['url']),
+  (1, lambda sites: 'twitter.com' in sites,
     'Person has many twitter.com links'),
-  (1, lambda x: youtube_re.search(x['url']),
+  (1, lambda sites: 'youtube.com' in sites,
     'Person has many youtube.com links'),
-]
+])
 
 membership_schema['properties']['role']['blank'] = False
 membership_schema['properties']['post_id']['post'] = True
-membership_schema['properties']['role']['enum'] = lambda x: ['candidate'] + styles.get(re.sub(r'\/(?:council|legislature)\Z', '', x['organization_id'].replace('jurisdiction:ocd-jurisdiction', 'ocd-division')), ['member'])
+membership_schema['properties']['role']['enum'] = lambda x: ['candidate'] + constants_index.load()['styles'].get(get_division_id(x['organization_id']), ['member'])
 membership_schema['properties']['contact_details'] = membership_contact_details
 membership_schema['properties']['links'] = membership_links
 membership_schema['matches'] = [(
@@ -175,13 +179,27 @@ uniqueRoles = [
   'Warden', 'Deputy Warden',
 ]
 
+
+division_ids_memo = {}
+
+
+def get_division_id(organization_id):
+  if organization_id not in division_ids_memo:
+    division_ids_memo[organization_id] = jurisdiction_suffix_re.sub('', organization_id.replace('jurisdiction:ocd-jurisdiction', 'ocd-division'))
+  return division_ids_memo[organization_id]
+
+
 def validate_post(self, x, fieldname, schema, path, post):
   if post and not x['organization_id'].startswith('party:'):
-    division_id = re.sub(r'\/(?:council|legislature)\Z', '', x['organization_id'].replace('jurisdiction:ocd-jurisdiction', 'ocd-division'))
+    constants = constants_index.load()
+    names = constants['names']
+    subdivisions = constants['subdivisions']
+    styles = constants['styles']
+    division_id = get_division_id(x['organization_id'])
     value = x.get(fieldname)
     if subdivisions.get(division_id):
       # Not among the known subdivisions for the division.
-      if value not in subdivisions[division_id] and not re.search(r'\AWards \d(?:(?:,| & | and )\d+)+\Z', value):
+      if value not in constants['subdivision_sets'][division_id] and not wards_re.search(value):
         self._error("Post: Value {value!r} for field '{fieldname}' is not "
                     "in the enumeration: {options!r}",
                     value, fieldname, options=subdivisions[division_id])
@@ -242,13 +260,13 @@ DatetimeValidator.validate_conditionalPattern = validate_conditionalPattern
 def validate_maxMatchingItems(self, x, fieldname, schema, path, arguments=None):
   value = x.get(fieldname)
   if isinstance(value, list):
-    for length, method, message in arguments:
-      count = 0
-      for v in value:
-        if method(v):
-          count += 1
-        if count > length:
-          self._error(message, value, fieldname)
+    key, matchers = arguments
+    counts = defaultdict(int)
+    for v in value:
+      counts[key(v)] += 1
+    for length, method, message in matchers:
+      if sum(count for k, count in counts.iteritems() if method(k)) > length:
+        self._error(message, value, fieldname)
 
 DatetimeValidator.validate_maxMatchingItems = validate_maxMatchingItems
 
@@ -260,3 +278,154 @@ def validate_matches(self, x, fieldname, schema, path, arguments=None):
       self._error(message, None, fieldname, **value)
 
 DatetimeValidator.validate_matches = validate_matches
+
+
+# validictory interprets a schema each time that it validates an object: for
+# each subschema, it copies the subschema, adds the default `required` and
+# `blank` keywords, and looks up the method for each keyword. Instead, compile
+# each subschema once, the first time it is used, into a list of closures, and
+# reuse the list. Where a closure can check a keyword faster than validictory,
+# it does, and calls validictory's method only if the check fails, so that the
+# error messages are the same.
+COMPILED_SCHEMAS_MEMO_SIZE = 1024
+compiled_schemas_memo = {}
+
+interpreted_validate = DatetimeValidator._SchemaValidator__validate.__func__
+
+# The Python types of validictory's simple types.
+simple_types = {
+  'array': (list, tuple),
+  'boolean': bool,
+  'null': type(None),
+  'object': dict,
+  'string': basestring,
+}
+
+
+def is_unpatched(validator_class, name):
+  method = getattr(validator_class, name, None)
+  return method is not None and method.__func__ is getattr(SchemaValidator, name).__func__
+
+
+def compile_type(validator_class, method, fieldtype):
+  if isinstance(fieldtype, basestring):
+    fieldtype = [fieldtype]
+  if not isinstance(fieldtype, (list, tuple)) or not all(isinstance(t, basestring) and t in simple_types and is_unpatched(validator_class, 'validate_type_' + t) for t in fieldtype):
+    return None
+  types = tuple(simple_types[t] for t in fieldtype)
+
+  def validate(self, x, fieldname, schema, *args):
+    if fieldname in x and not isinstance(x[fieldname], types):
+      method(self, x, fieldname, schema, *args)
+  return validate
+
+
+def compile_required(validator_class, method, required):
+  if not required:
+    return False
+
+  def validate(self, x, fieldname, schema, *args):
+    if fieldname not in x:
+      method(self, x, fieldname, schema, *args)
+  return validate
+
+
+def compile_blank(validator_class, method, blank):
+  if blank:
+    return False
+
+  def validate(self, x, fieldname, schema, *args):
+    value = x.get(fieldname)
+    if not value and isinstance(value, basestring):
+      method(self, x, fieldname, schema, *args)
+  return validate
+
+
+def compile_enum(validator_class, method, options):
+  if not isinstance(options, (list, tuple)):
+    return None
+  try:
+    options = frozenset(options)
+  except TypeError:  # Unhashable options.
+    return None
+
+  def validate(self, x, fieldname, schema, *args):
+    try:
+      if x.get(fieldname) in options:
+        return
+    except TypeError:  # Unhashable value.
+      pass
+    method(self, x, fieldname, schema, *args)
+  return validate
+
+
+def compile_additionalProperties(validator_class, method, additionalProperties):
+  if additionalProperties is not False:
+    return None
+
+  def validate(self, x, fieldname, schema, *args):
+    value = x.get(fieldname)
+    if isinstance(value, dict):
+      properties = schema.get('properties') or {}
+      if 'patternProperties' in schema or any(key not in properties for key in value):
+        method(self, x, fieldname, schema, *args)
+  return validate
+
+
+# Each function returns a closure, False if the keyword needs no validation, or
+# None if the keyword must be validated by validictory's method.
+keyword_compilers = {
+  'additionalProperties': compile_additionalProperties,
+  'blank': compile_blank,
+  'enum': compile_enum,
+  'required': compile_required,
+  'type': compile_type,
+}
+
+
+def compile_schema(validator_class, schema, required_by_default, blank_by_default):
+  """
+  Returns a list of `(closure, value)` tuples, one for each keyword in the
+  schema that the validator class has a method for, in the order in which
+  validictory calls the methods.
+  """
+  newschema = copy(schema)
+  if 'required' not in schema:
+    newschema['required'] = required_by_default
+  if 'blank' not in schema:
+    newschema['blank'] = blank_by_default
+
+  closures = []
+  for keyword in newschema:
+    method = getattr(validator_class, 'validate_' + keyword, None)
+    if method:
+      value = newschema[keyword]
+      closure = None
+      if keyword in keyword_compilers and is_unpatched(validator_class, 'validate_' + keyword):
+        closure = keyword_compilers[keyword](validator_class, method.__func__, value)
+      if closure is None:
+        closure = method.__func__
+      if closure is not False:
+        closures.append((closure, value))
+  return closures
+
+
+def compiled_validate(self, fieldname, data, schema, *args):
+  if schema is not None:
+    # Defaults are applied to the data after validation. Leave them to validictory.
+    if getattr(self, 'apply_default_to_data', False):
+      return interpreted_validate(self, fieldname, data, schema, *args)
+    if not isinstance(schema, dict):
+      raise SchemaError("Type for field '%s' must be 'dict', got: '%s'" % (fieldname, type(schema).__name__))
+    key = (self.__class__, id(schema), self.required_by_default, getattr(self, 'blank_by_default', False))
+    if key not in compiled_schemas_memo:
+      # pupa's schemas are few and long-lived, but other schemas might not be.
+      if len(compiled_schemas_memo) >= COMPILED_SCHEMAS_MEMO_SIZE:
+        compiled_schemas_memo.clear()
+      # Keep a reference to the schema, so that its id is not reused.
+      compiled_schemas_memo[key] = (schema, compile_schema(self.__class__, schema, key[2], key[3]))
+    for closure, value in compiled_schemas_memo[key][1]:
+      closure(self, data, fieldname, schema, *(args + (value,)))
+  return data
+
+DatetimeValidator._SchemaValidator__validate = compiled_validate
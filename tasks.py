@@ -2,18 +2,32 @@
 
 import importlib
 import codecs
+from collections import defaultdict, deque, OrderedDict
 import csv
+import glob
+import hashlib
+import json
+from multiprocessing import Manager, Pool
 import os
 import re
+import shutil
+import signal
 import string
 from StringIO import StringIO
+import sys
+import threading
+import time
+from urlparse import urlparse
 
 from git import Repo
 from invoke import run, task
 import lxml.html
 import requests
+from requests.adapters import HTTPAdapter
 from unidecode import unidecode
 
+import constants_index
+
 
 # Map Standard Geographical Classification codes to the OCD identifiers of provinces and territories.
 province_and_territory_codes_memo = {}
@@ -198,15 +212,830 @@ def get_definition(division_id, aggregation=False):
   return expected
 
 
+def modules():
+  """
+  Yields the names of the jurisdictions' modules.
+  """
+  for module_name in os.listdir('.'):
+    if os.path.isdir(module_name) and module_name not in ('.git', 'agenda_item_cache', 'fixtures', 'http_cache', 'pdf_cache', 'scrape_cache', 'scrape_store', 'scraped_data', 'tests', 'vote_store', '__pycache__'):
+      yield module_name
+
+
 @task
 def urls():
-  for module_name in os.listdir('.'):
-    if os.path.isdir(module_name) and module_name not in ('.git', 'scrape_cache', 'scraped_data', '__pycache__'):
-      module = importlib.import_module('%s.people' % module_name)
-      if module.__dict__.get('COUNCIL_PAGE'):
-        print '%-60s %s' % (module_name, module.__dict__['COUNCIL_PAGE'])
+  for module_name in modules():
+    module = importlib.import_module('%s.people' % module_name)
+    if module.__dict__.get('COUNCIL_PAGE'):
+      print '%-60s %s' % (module_name, module.__dict__['COUNCIL_PAGE'])
+    else:
+      print '%-60s COUNCIL_PAGE not defined' % module_name
+
+
+# Counts of HTTP requests sent and of objects saved in a scrape_all worker.
+scrape_counts = {'requests': 0, 'objects': 0}
+# The directories to which a scrape_all worker's scrapers saved objects.
+scrape_output_dirs = set()
+# Maps a module's name to the process ID of the scrape_all worker running it
+# and the time at which the worker started it. Shared by scrape_all's workers.
+scrape_started = None
+
+
+def count_calls(cls, method_name, key):
+  method = getattr(cls, method_name)
+
+  def wrapper(self, *args, **kwargs):
+    scrape_counts[key] += 1
+    return method(self, *args, **kwargs)
+
+  setattr(cls, method_name, wrapper)
+
+
+def init_scrape_worker(started=None):
+  global scrape_started
+  from pupa.scrape import Scraper
+  scrape_started = started
+  count_calls(HTTPAdapter, 'send', 'requests')
+  count_calls(Scraper, 'save_object', 'objects')
+
+  save_object = Scraper.save_object
+
+  def wrapper(self, obj):
+    scrape_output_dirs.add(self.output_dir)
+    return save_object(self, obj)
+
+  Scraper.save_object = wrapper
+
+
+# The fingerprints and output of the last successful run of each module, used
+# by `invoke scrape_all --changed-only`.
+STORE_DIR = 'scrape_store'
+
+
+def fingerprint(module_name):
+  """
+  Returns a hash of the bodies at the URLs of the people module's `*_PAGE` and
+  `*_URL` constants (e.g. COUNCIL_PAGE and COUNCIL_CSV_URL), or None if the
+  module has no such URL or if it has other scrapers, whose inputs are unknown.
+  """
+  from utils import http_get
+
+  for scraper_type in ('bills', 'events', 'speeches', 'votes'):
+    if os.path.exists(os.path.join(module_name, '%s.py' % scraper_type)):
+      return None
+
+  module = importlib.import_module('%s.people' % module_name)
+  urls = sorted(value for key, value in module.__dict__.items() if (key.endswith('_PAGE') or key.endswith('_URL')) and isinstance(value, basestring) and re.match(r'(?:ftp|https?)://', value))
+  if not urls:
+    return None
+
+  digest = hashlib.sha1()
+  for url in urls:
+    response = http_get(url)
+    if response.status_code != 200:
+      return None
+    digest.update(url.encode('utf-8'))
+    digest.update(response.content)
+  return digest.hexdigest()
+
+
+def read_store(module_name):
+  try:
+    with open(os.path.join(STORE_DIR, module_name, 'store.json')) as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return None
+
+
+def write_store(module_name, digest):
+  """
+  Copies the module's output to the store, with its inputs' fingerprint.
+  """
+  directory = os.path.join(STORE_DIR, module_name)
+  if os.path.isdir(directory):
+    shutil.rmtree(directory)
+  output_dirs = sorted(scrape_output_dirs)
+  for index, output_dir in enumerate(output_dirs):
+    shutil.copytree(output_dir, os.path.join(directory, str(index)))
+  with open(os.path.join(directory, 'store.json'), 'w') as f:
+    json.dump({'fingerprint': digest, 'output_dirs': output_dirs}, f)
+
+
+def restore_store(module_name, store):
+  """
+  Re-emits the module's stored output, and returns the number of objects.
+  """
+  count = 0
+  for index, output_dir in enumerate(store['output_dirs']):
+    if not os.path.isdir(output_dir):
+      os.makedirs(output_dir)
+    for path in glob.glob(os.path.join(output_dir, '*.json')):
+      os.remove(path)
+    for path in glob.glob(os.path.join(STORE_DIR, module_name, str(index), '*.json')):
+      shutil.copy(path, output_dir)
+      count += 1
+  return count
+
+
+def scrape_module(module_name, scrape_only, changed_only=False):
+  """
+  Runs `pupa.cli update` on a module in a scrape_all worker, and returns the
+  module's wall time, request count and object count.
+
+  If `changed_only` is set and the module's inputs are unchanged since its last
+  successful run, re-emits the last run's output instead.
+  """
+  scrape_counts['requests'] = 0
+  scrape_counts['objects'] = 0
+  scrape_output_dirs.clear()
+  result = {'module_name': module_name, 'error': None, 'skipped': False}
+  start = time.time()
+  if scrape_started is not None:
+    scrape_started[module_name] = (os.getpid(), start)
+
+  digest = None
+  if changed_only:
+    try:
+      digest = fingerprint(module_name)
+    except Exception:  # Scrape as usual.
+      pass
+    store = read_store(module_name)
+    if digest and store and store['fingerprint'] == digest:
+      result['skipped'] = True
+      result['time'] = round(time.time() - start, 3)
+      result['requests'] = scrape_counts['requests']
+      result['objects'] = restore_store(module_name, store)
+      return result
+
+  sys.argv = ['pupa', 'update', '--nonstrict'] + (['--scrape'] if scrape_only else []) + [module_name]
+  start = time.time()
+  try:
+    from pupa.cli.__main__ import main
+    main()
+  except SystemExit as e:
+    if e.code:
+      result['error'] = 'SystemExit: %s' % e.code
+  except Exception as e:
+    result['error'] = '%s: %s' % (e.__class__.__name__, e)
+  result['time'] = round(time.time() - start, 3)
+  result.update(scrape_counts)
+
+  if digest and not result['error'] and scrape_output_dirs:
+    write_store(module_name, digest)
+  return result
+
+
+def is_running(pid):
+  try:
+    os.kill(pid, 0)
+  except OSError:
+    return False
+  return True
+
+
+def next_result(pending, started, timeout):
+  """
+  Waits for a module in a scrape_all worker to finish, and returns its result.
+  If `scrape_module` raised an exception, if its worker died, or if it ran for
+  longer than `timeout` seconds since its worker started it, returns a result
+  with the error. A timed out worker is killed, so that the pool replaces it.
+  """
+  while True:
+    for module_name, async_result in pending.items():
+      error = None
+      pid, start = started.get(module_name, (None, None))
+      if async_result.ready():
+        try:
+          result = async_result.get()
+          del pending[module_name]
+          return result
+        except Exception as e:
+          error = '%s: %s' % (e.__class__.__name__, e)
+      elif pid is None:  # Not started.
+        continue
+      elif not is_running(pid):
+        error = 'WorkerDied: process %d exited' % pid
+      elif time.time() - start > timeout:
+        try:
+          os.kill(pid, signal.SIGKILL)
+        except OSError:  # It just exited.
+          pass
+        # The pool reaps the killed worker before it starts a replacement.
+        while is_running(pid):
+          time.sleep(0.1)
+        error = 'Timeout: no result after %ds' % timeout
+      if error:
+        del pending[module_name]
+        return {
+          'module_name': module_name,
+          'error': error,
+          'skipped': False,
+          'time': round(time.time() - start, 3) if start else 0,
+          'requests': 0,
+          'objects': 0,
+        }
+    time.sleep(0.1)
+
+
+@task
+def scrape_all(workers=4, per_host=1, output='scrape_all.json', scrape_only=False, changed_only=False, timeout=3600):
+  """
+  Runs all jurisdictions' scrapers across a pool of processes, running at most
+  `per_host` jurisdictions at once whose COUNCIL_PAGE is on the same host, and
+  writes each jurisdiction's wall time, request count and object count to a
+  JSON file. A jurisdiction whose worker dies, or that runs for longer than
+  `timeout` seconds, is reported as an error; a timed out worker is killed.
+
+  With `changed_only`, skips the jurisdictions whose inputs are unchanged since
+  their last successful run, and re-emits their last run's output.
+  """
+  workers = int(workers)
+  per_host = int(per_host)
+  timeout = int(timeout)
+
+  # Group the modules by host, so that workers take turns between hosts.
+  queues = OrderedDict()
+  hosts = {}
+  for module_name in sorted(modules()):
+    module = importlib.import_module('%s.people' % module_name)
+    host = urlparse(module.__dict__.get('COUNCIL_PAGE') or '').netloc or module_name
+    queues.setdefault(host, deque()).append(module_name)
+    hosts[module_name] = host
+
+  started = Manager().dict()
+  pool = Pool(workers, init_scrape_worker, (started,))
+  pending = {}
+  in_flight = defaultdict(int)
+  summary = []
+  start = time.time()
+
+  while queues or pending:
+    for host in queues.keys():
+      if len(pending) == workers:
+        break
+      if in_flight[host] < per_host:
+        module_name = queues[host].popleft()
+        if not queues[host]:
+          del queues[host]
+        else:  # Move the host to the back of the line.
+          queues[host] = queues.pop(host)
+        in_flight[host] += 1
+        pending[module_name] = pool.apply_async(scrape_module, (module_name, scrape_only, changed_only))
+
+    # A module's host and worker stay reserved until its worker finishes it, or
+    # until its worker dies or is killed, and the pool replaces the worker.
+    result = next_result(pending, started, timeout)
+    in_flight[hosts[result['module_name']]] -= 1
+    summary.append(result)
+    print '%-60s %8.1fs %5d requests %5d objects %s' % (result['module_name'], result['time'], result['requests'], result['objects'], result['error'] or ('unchanged' if result['skipped'] else ''))
+
+  # Every module has a result. The pool would wait forever for the results of
+  # the modules whose workers died or were killed, so it isn't closed.
+  pool.terminate()
+  pool.join()
+
+  with open(output, 'w') as f:
+    json.dump({
+      'workers': workers,
+      'per_host': per_host,
+      'time': round(time.time() - start, 3),
+      'jurisdictions': sorted(summary, key=lambda result: result['module_name']),
+    }, f, indent=2, sort_keys=True)
+
+
+class PhaseTimer(object):
+
+  """
+  Attributes each thread's time to the innermost phase that it's in, so that a
+  phase's time excludes the time of the phases nested within it.
+  """
+
+  def __init__(self):
+    self.totals = defaultdict(float)
+    self.local = threading.local()
+
+  def enter(self, phase):
+    now = time.time()
+    stack = self.local.__dict__.setdefault('stack', [])
+    if stack:
+      self.totals[stack[-1]] += now - self.local.mark
+    stack.append(phase)
+    self.local.mark = now
+
+  def exit(self):
+    now = time.time()
+    self.totals[self.local.stack.pop()] += now - self.local.mark
+    self.local.mark = now
+
+  def wrap(self, obj, name, phase):
+    function = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+      self.enter(phase)
+      try:
+        return function(*args, **kwargs)
+      finally:
+        self.exit()
+
+    setattr(obj, name, wrapper)
+
+  def reset(self):
+    self.totals.clear()
+
+
+# The phases of a bench worker's scrapers. Time not spent fetching, parsing,
+# cleaning, validating or saving objects is spent extracting data from pages.
+BENCH_PHASES = ('fetch', 'parse', 'extract', 'clean', 'validate', 'other')
+bench_timer = PhaseTimer()
+
+
+def init_bench_worker():
+  import lxml.html
+  from pupa.scrape import Scraper
+  import utils
+
+  init_scrape_worker()
+  utils.http_cache = None
+  for obj, name, phase in (
+    (HTTPAdapter, 'send', 'fetch'),
+    (lxml.html, 'fromstring', 'parse'),
+    (utils, 'extract_pdf_pages', 'parse'),
+    (utils, 'clean_string', 'clean'),
+    (utils, 'clean_name', 'clean'),
+    (utils, 'clean_address', 'clean'),
+    (utils, 'clean_telephone_number', 'clean'),
+    (utils, 'clean_telephone_numbers', 'clean'),
+    (utils.patch.DatetimeValidator, 'validate', 'validate'),
+    (Scraper, 'save_object', 'other'),
+  ):
+    bench_timer.wrap(obj, name, phase)
+
+
+def bench_module(module_name):
+  """
+  Runs a module's scrapers against its recorded responses in a bench worker,
+  and returns its wall time and the time spent in each phase.
+  """
+  bench_timer.reset()
+  bench_timer.enter('extract')
+  try:
+    result = scrape_module(module_name, True)
+  finally:
+    bench_timer.exit()
+  result['phases'] = {phase: round(bench_timer.totals[phase], 3) for phase in BENCH_PHASES}
+  return result
+
+
+@task
+def bench(workers=1, output='bench.json', jurisdictions=''):
+  """
+  Runs each jurisdiction's scrapers against the responses recorded with
+  HTTP_FIXTURES=record, and writes each jurisdiction's wall time and its time
+  per phase (fetch, parse, extract, clean, validate, other) to a JSON file. The
+  slowest jurisdictions are printed first.
+  """
+  # Must be set before utils is imported.
+  os.environ['HTTP_FIXTURES'] = 'replay'
+  module_names = jurisdictions.split(',') if jurisdictions else sorted(modules())
+
+  pool = Pool(int(workers), init_bench_worker)
+  try:
+    summary = pool.map(bench_module, module_names, 1)
+  finally:
+    pool.close()
+    pool.join()
+
+  summary.sort(key=lambda result: -result['time'])
+  print '%-50s %8s %s' % ('', 'total', ' '.join('%8s' % phase for phase in BENCH_PHASES))
+  for result in summary:
+    print '%-50s %8.2f %s %s' % (result['module_name'], result['time'], ' '.join('%8.2f' % result['phases'][phase] for phase in BENCH_PHASES), result['error'] or '')
+
+  with open(output, 'w') as f:
+    json.dump({
+      'time': round(sum(result['time'] for result in summary), 3),
+      'jurisdictions': summary,
+    }, f, indent=2, sort_keys=True)
+
+
+class StackSampler(object):
+
+  """
+  Samples the stack of each thread every `interval` seconds from a background
+  thread, while started, and counts each distinct stack. Unlike cProfile, it
+  samples the threads of a scraper's thread pools, and it records whole stacks.
+  """
+
+  def __init__(self, interval, include):
+    self.interval = interval
+    self.include = include
+    self.stacks = defaultdict(int)
+    self.samples = 0
+    self.running = False
+    self.thread = None
+
+  def start(self):
+    self.running = True
+    self.thread = threading.Thread(target=self.run)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def stop(self):
+    self.running = False
+    self.thread.join()
+
+  def run(self):
+    ident = threading.current_thread().ident
+    while self.running:
+      time.sleep(self.interval)
+      for thread_ident, frame in sys._current_frames().items():
+        if thread_ident == ident:
+          continue
+        stack = []
+        while frame:
+          code = frame.f_code
+          stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+          frame = frame.f_back
+        stack.reverse()
+        if self.include(stack):
+          self.stacks[tuple(stack)] += 1
+          self.samples += 1
+
+
+# The categories to which a profile's time is attributed, in the order printed.
+PROFILE_CATEGORIES = ('scraper', 'utils', 'patch', 'pupa', 'other')
+
+
+def profile_category(filename, module_dir):
+  filename = os.path.abspath(filename)
+  if filename.startswith(module_dir + os.sep):
+    return 'scraper'
+  directory, basename = os.path.split(filename)
+  if directory == os.path.dirname(module_dir):
+    if basename.startswith(('utils.', 'http_fixtures.', 'instrumentation.')):
+      return 'utils'
+    if basename.startswith(('patch.', 'constants.', 'constants_index.')):
+      return 'patch'
+  if '%spupa%s' % (os.sep, os.sep) in filename:
+    return 'pupa'
+  return 'other'
+
+
+def profile_label(filename, name, lineno):
+  filename = os.path.abspath(filename)
+  directory = os.path.dirname(os.path.abspath(__file__))
+  if filename.startswith(directory + os.sep):
+    filename = os.path.relpath(filename, directory)
+  elif 'site-packages' in filename:
+    filename = filename.split('site-packages' + os.sep, 1)[1]
+  return '%s:%s:%d' % (filename, name, lineno)
+
+
+@task
+def profile(module_name, types='people', output='', interval=0.005):
+  """
+  Runs a jurisdiction's scrapers of the given types (for example,
+  `--types=votes,events`) under a sampling profiler, prints the share of time
+  spent in the scraper module, in utils, in patch, in pupa and elsewhere, and
+  writes the sampled stacks to a collapsed-stack file for flamegraph.pl or
+  speedscope. A sample is attributed to its innermost frame in one of the first
+  four categories.
+  """
+  from utils import CanadianJurisdiction
+
+  types = types.split(',')
+  output = output or '%s.collapsed' % module_name
+  module_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), module_name)
+  sampler = StackSampler(float(interval), lambda stack: any(profile_category(filename, module_dir) != 'other' for filename, _, _ in stack))
+
+  init_scrape_worker()
+
+  # Scrape only the given types, and sample only while their scrapers run.
+  jurisdiction_init = CanadianJurisdiction.__init__
+  get_scraper = CanadianJurisdiction.get_scraper
+
+  def profiled_init(self):
+    jurisdiction_init(self)
+    self.provides = [scraper_type for scraper_type in self.provides if scraper_type in types]
+
+  def profiled_get_scraper(self, session, scraper_type):
+    scraper_class = get_scraper(self, session, scraper_type)
+    if scraper_class is None:
+      return None
+    method_name = 'get_%s' % scraper_type
+    method = getattr(scraper_class, method_name)
+
+    def profiled_method(scraper):
+      sampler.start()
+      try:
+        for obj in method(scraper):
+          yield obj
+      finally:
+        sampler.stop()
+
+    return type(scraper_class.__name__, (scraper_class,), {method_name: profiled_method})
+
+  CanadianJurisdiction.__init__ = profiled_init
+  CanadianJurisdiction.get_scraper = profiled_get_scraper
+  try:
+    result = scrape_module(module_name, True)
+  finally:
+    CanadianJurisdiction.__init__ = jurisdiction_init
+    CanadianJurisdiction.get_scraper = get_scraper
+
+  if result['error']:
+    print result['error']
+  if not sampler.samples:
+    raise Exception('No samples of %s scrapers of types %s.' % (module_name, ', '.join(types)))
+
+  categories = defaultdict(int)
+  functions = defaultdict(int)
+  for stack, count in sampler.stacks.items():
+    category = 'other'
+    for filename, _, _ in reversed(stack):
+      category = profile_category(filename, module_dir)
+      if category != 'other':
+        break
+    categories[category] += count
+    functions[profile_label(*stack[-1])] += count
+
+  print '%.1fs, %d samples, %d requests, %d objects' % (result['time'], sampler.samples, result['requests'], result['objects'])
+  for category in PROFILE_CATEGORIES:
+    print '%-10s %5.1f%%' % (category, 100.0 * categories[category] / sampler.samples)
+  print
+  for label, count in sorted(functions.items(), key=lambda item: -item[1])[:20]:
+    print '%5.1f%% %s' % (100.0 * count / sampler.samples, label)
+
+  with open(output, 'w') as f:
+    for stack, count in sorted(sampler.stacks.items()):
+      f.write('%s %d\n' % (';'.join(profile_label(*frame) for frame in stack), count))
+  print
+  print 'Wrote %s' % output
+
+
+@task
+def constants():
+  """
+  Rebuilds the marshalled copy of constants.py that patch.py loads.
+  """
+  constants_index.build()
+
+
+@task
+def benchmark_constants(runs=10):
+  """
+  Compares the time to import patch and to load the constants, when constants.py
+  is executed on import (as before) and when its marshalled copy is loaded on
+  first use.
+  """
+  constants_index.build()
+  statements = [
+    ('execute constants.py', 'import constants'),
+    ('load constants.marshal', 'import constants_index; constants_index.load()'),
+    ('import patch, executing constants.py', 'import constants, patch'),
+    ('import patch', 'import patch'),
+    ('import patch, loading constants.marshal', 'import patch; patch.constants_index.load()'),
+  ]
+  for label, statement in statements:
+    timings = []
+    for _ in range(int(runs)):
+      output = run('%s -c "import time; start = time.time(); %s; print time.time() - start"' % (sys.executable, statement), hide='both').stdout
+      timings.append(float(output.strip().splitlines()[-1]))
+    print '%-45s min %7.1f ms  median %7.1f ms' % (label, min(timings) * 1000, sorted(timings)[len(timings) // 2] * 1000)
+
+
+def scraped_strings(path, keys=None):
+  """
+  Returns the strings in the scraped objects' JSON files in the directory, or
+  only the strings whose keys are in `keys`.
+  """
+  strings = []
+
+  def collect(value, key=None):
+    if isinstance(value, dict):
+      for k, v in value.items():
+        collect(v, k)
+    elif isinstance(value, list):
+      for v in value:
+        collect(v, key)
+    elif isinstance(value, basestring) and (keys is None or key in keys):
+      strings.append(value)
+
+  for directory, dirnames, filenames in os.walk(path):
+    for filename in filenames:
+      if filename.endswith('.json'):
+        with open(os.path.join(directory, filename)) as f:
+          collect(json.load(f))
+  return strings
+
+
+def scraped_contact_details(path, type):
+  """
+  Returns the values of the contact details of the type in the scraped objects'
+  JSON files in the directory.
+  """
+  values = []
+
+  def collect(value):
+    if isinstance(value, dict):
+      if value.get('type') == type and isinstance(value.get('value'), basestring):
+        values.append(value['value'])
+      for v in value.values():
+        collect(v)
+    elif isinstance(value, list):
+      for v in value:
+        collect(v)
+
+  for directory, dirnames, filenames in os.walk(path):
+    for filename in filenames:
+      if filename.endswith('.json'):
+        with open(os.path.join(directory, filename)) as f:
+          collect(json.load(f))
+  return values
+
+
+def time_function(function, corpus, runs):
+  """
+  Returns the minimum time in seconds to call the function on every string in
+  the corpus.
+  """
+  timings = []
+  for _ in range(int(runs)):
+    start = time.time()
+    for value in corpus:
+      function(value)
+    timings.append(time.time() - start)
+  return min(timings)
+
+
+def compare_functions(label, before, after, corpus, runs):
+  """
+  Prints the time per call of the functions, after checking that they return
+  the same values on the corpus.
+  """
+  for value in corpus:
+    if before(value) != after(value):
+      raise Exception('%s: %r returns %r before and %r after' % (label, value, before(value), after(value)))
+  before_time = time_function(before, corpus, runs)
+  after_time = time_function(after, corpus, runs)
+  print '%-20s before %6.2f us  after %6.2f us  %5.2fx' % (label, before_time / len(corpus) * 1e6, after_time / len(corpus) * 1e6, before_time / after_time)
+
+
+@task
+def benchmark_cleaning(path='scraped_data', runs=10):
+  """
+  Compares the time to clean strings before and after utils.clean_string's
+  fast path, on the strings scraped into the directory.
+  """
+  import utils
+
+  def clean_string(s):
+    return re.sub(r' *\n *', '\n', re.sub(r'[^\S\n]+', ' ', unicode(s).translate(utils.table), flags=re.U).strip())
+
+  def clean_name(s):
+    return utils.honorific_suffix_re.sub('', utils.honorific_prefix_re.sub('', clean_string(s)))
+
+  corpus = scraped_strings(path)
+  if not corpus:
+    raise Exception('No scraped strings in %s. Run `pupa update` or `invoke scrape_all` first.' % path)
+  print '%d strings' % len(corpus)
+  compare_functions('clean_string', clean_string, utils.clean_string, corpus, runs)
+  compare_functions('clean_name', clean_name, utils.clean_name, corpus, runs)
+  # Scraped strings are already clean. Dirty them to time the slow path.
+  dirty = [u' %s\xa0 \n' % value.replace(' ', '  ').replace("'", u'\u2019') for value in corpus]
+  compare_functions('clean_string (dirty)', clean_string, utils.clean_string, dirty, runs)
+
+
+@task
+def benchmark_addresses(path='scraped_data', modules='ca_sk_municipalities,ca_yt_municipalities', runs=10):
+  """
+  Compares the time to clean addresses before and after utils.clean_address's
+  single regular expression and memo, on the addresses scraped into the
+  modules' directories.
+  """
+  import utils
+
+  def clean_address(s):
+    s = re.sub(r'\b[A-Z][O0-9][A-Z]\s?[O0-9][A-Z][O0-9]\b', lambda x: x.group(0).replace('O', '0'), utils.clean_string(s))
+    for k, v in utils.abbreviations.iteritems():
+      s = re.sub(r'[,\n ]+\(?' + k + r'\)?(?=(?:[,\n ]+Canada)?(?:[,\n ]+[A-Z][0-9][A-Z]\s?[0-9][A-Z][0-9])?\Z)', ' ' + v, s)
+    return re.sub(r'[,\n ]+([A-Z]{2})(?:[,\n ]+Canada)?[,\n ]+([A-Z][0-9][A-Z])\s?([0-9][A-Z][0-9])\Z', r' \1  \2 \3', s)
+
+  corpus = []
+  for module_name in modules.split(','):
+    for directory in glob.glob(os.path.join(path, '%s*' % module_name)):
+      corpus += scraped_contact_details(directory, 'address')
+  if not corpus:
+    raise Exception('No scraped addresses in %s. Run `pupa update` or `invoke scrape_all` first.' % path)
+  print '%d addresses, %d distinct' % (len(corpus), len(set(corpus)))
+  compare_functions('format_address', clean_address, utils.format_address, corpus, runs)
+  compare_functions('clean_address', clean_address, utils.clean_address, corpus, runs)
+
+
+@task
+def benchmark_telephone_numbers(path='scraped_data', runs=10):
+  """
+  Compares the time to normalize telephone numbers before and after
+  utils.clean_telephone_number's precompiled patterns, one by one and in a
+  batch, on the numbers scraped into the directory.
+  """
+  import utils
+
+  def clean_telephone_number(s):
+    splits = re.split(r'(?:/|x|ext[.:]?|poste)[\s-]?(?=\b|\d)', s, flags=re.IGNORECASE)
+    digits = re.sub(r'\D', '', splits[0])
+    if len(digits) == 10:
+      digits = '1' + digits
+    if len(digits) == 11 and digits[0] == '1' and len(splits) <= 2:
+      digits = re.sub(r'\A(\d)(\d{3})(\d{3})(\d{4})\Z', r'\1-\2-\3-\4', digits)
+      if len(splits) == 2:
+        return '%s x%s' % (digits, splits[1])
       else:
-        print '%-60s COUNCIL_PAGE not defined' % module_name
+        return digits
+    else:
+      return s
+
+  corpus = []
+  for type in ('text', 'voice', 'fax', 'cell', 'video', 'pager'):
+    corpus += scraped_contact_details(path, type)
+  if not corpus:
+    raise Exception('No scraped telephone numbers in %s. Run `pupa update` or `invoke scrape_all` first.' % path)
+  print '%d numbers' % len(corpus)
+  compare_functions('clean_telephone_number', clean_telephone_number, utils.clean_telephone_number, corpus, runs)
+  batch_time = time_function(utils.clean_telephone_numbers, [corpus], runs)
+  print '%-20s %6.2f us' % ('clean_telephone_numbers', batch_time / len(corpus) * 1e6)
+  reasons = defaultdict(int)
+  for value, reason in utils.clean_telephone_numbers(corpus):
+    reasons[reason] += 1
+  for reason, count in sorted(reasons.items()):
+    print '%-20s %d' % (reason or 'normalized', count)
+
+
+@task
+def benchmark_columns(runs=100):
+  """
+  Compares the time to split the municipal directories into columns before
+  and after utils.detect_columns and utils.split_columns, on the layout text in
+  tests/data.
+  """
+  from ca_nl_municipalities.people import municipal_rows
+  from ca_sk_municipalities.people import split_districts
+  from ca_yt_municipalities.people import name_column
+  from tests import test_municipal_columns as data
+
+  def old_split_districts(page):
+    return [district for district in data.old_split_districts(page) if any(district)]
+
+  compare_functions('ca_yt_municipalities', data.old_name_column, name_column, data.yukon_municipalities(), runs)
+  compare_functions('ca_sk_municipalities', old_split_districts, split_districts, data.saskatchewan_pages(), runs)
+  compare_functions('ca_nl_municipalities', data.old_municipal_rows, municipal_rows, data.newfoundland_and_labrador_pages(), runs)
+
+
+@task
+def benchmark_validation(path='scraped_data', modules='ca,ca_qc', runs=3):
+  """
+  Compares the time to validate the people, memberships and organizations
+  scraped into the modules' directories, when validictory interprets the
+  schemas and when patch.py's compiled schemas are used, after checking that
+  both return the same errors.
+  """
+  import patch
+
+  class InterpretedValidator(patch.DatetimeValidator):
+    _SchemaValidator__validate = patch.interpreted_validate
+
+  schemas = {
+    'membership': patch.membership_schema,
+    'organization': patch.organization_schema,
+    'person': patch.person_schema,
+  }
+
+  objects = []
+  for module_name in modules.split(','):
+    for filename in glob.glob(os.path.join(path, module_name, '*.json')):
+      with open(filename) as f:
+        data = json.load(f)
+      if data.get('_type') in schemas:
+        objects.append((data, schemas[data['_type']]))
+  if not objects:
+    raise Exception('No scraped people, memberships or organizations in %s. Run `pupa update` or `invoke scrape_all` first.' % path)
+  print '%d objects' % len(objects)
+
+  def validate_all(validator_class):
+    errors = []
+    for data, schema in objects:
+      try:
+        validator_class(required_by_default=False).validate(data, schema)
+        errors.append(None)
+      except Exception as e:
+        errors.append(str(e))
+    return errors
+
+  errors = validate_all(InterpretedValidator)
+  if errors != validate_all(patch.DatetimeValidator):
+    raise Exception('The compiled schemas return different errors')
+  print '%d errors' % len([error for error in errors if error])
+  before_time = time_function(validate_all, [InterpretedValidator], runs)
+  after_time = time_function(validate_all, [patch.DatetimeValidator], runs)
+  print '%-20s before %6.2f us  after %6.2f us  %5.2fx' % ('validate', before_time / len(objects) * 1e6, after_time / len(objects) * 1e6, before_time / after_time)
 
 
 @task
@@ -269,12 +1098,12 @@ def tidy():
 
   codes = province_and_territory_codes()
 
-  for module_name in os.listdir('.'):
+  for module_name in modules():
     jurisdiction_ids = set()
     aggregation_division_ids = set()
     division_ids = set()
 
-    if os.path.isdir(module_name) and module_name not in ('.git', 'scrape_cache', 'scraped_data', '__pycache__') and not module_name.endswith('_candidates'):
+    if not module_name.endswith('_candidates'):
       module = importlib.import_module(module_name)
       for obj in module.__dict__.values():
         jurisdiction_id = getattr(obj, 'jurisdiction_id', None)
@@ -373,10 +1202,9 @@ def tidy():
 
 @task
 def sources():
-  for module_name in os.listdir('.'):
-    if os.path.isdir(module_name) and module_name not in ('.git', 'scrape_cache', 'scraped_data', '__pycache__'):
-      path = os.path.join(module_name, 'people.py')
-      with codecs.open(path, 'r', 'utf8') as f:
-        content = f.read()
-        if content.count('add_source') < content.count('lxmlize') - 1:  # exclude the import
-          print 'Add source? %s' % path
+  for module_name in modules():
+    path = os.path.join(module_name, 'people.py')
+    with codecs.open(path, 'r', 'utf8') as f:
+      content = f.read()
+      if content.count('add_source') < content.count('lxmlize') - 1:  # exclude the import
+        print 'Add source? %s' % path
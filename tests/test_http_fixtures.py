@@ -0,0 +1,75 @@
+# coding: utf-8
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+import shutil
+import tempfile
+import threading
+import unittest
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import http_fixtures
+
+
+class Handler(BaseHTTPRequestHandler):
+
+  def do_GET(self):
+    if self.path == '/redirect':
+      self.send_response(302)
+      self.send_header('Location', '/page')
+      self.end_headers()
+    else:
+      body = '<html><body>Council</body></html>'
+      self.send_response(200)
+      self.send_header('Content-Type', 'text/html; charset=utf-8')
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class HTTPFixturesTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.mode, self.store, self.jurisdiction = http_fixtures.MODE, http_fixtures.store, http_fixtures.jurisdiction
+    http_fixtures.store = http_fixtures.FixtureStore(self.directory)
+    http_fixtures.jurisdiction = 'ca_test'
+    HTTPAdapter.send = http_fixtures.send
+
+  def tearDown(self):
+    HTTPAdapter.send = http_fixtures.adapter_send
+    http_fixtures.MODE, http_fixtures.store, http_fixtures.jurisdiction = self.mode, self.store, self.jurisdiction
+    shutil.rmtree(self.directory)
+
+  def test_record_and_replay_redirect(self):
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:%d/redirect' % server.server_port
+    try:
+      http_fixtures.MODE = 'record'
+      recorded = requests.get(url)
+    finally:
+      server.shutdown()
+      server.server_close()
+
+    http_fixtures.MODE = 'replay'
+    http_fixtures.store = http_fixtures.FixtureStore(self.directory)
+    replayed = requests.get(url)
+
+    self.assertEqual(replayed.status_code, 200)
+    self.assertEqual(replayed.url, recorded.url)
+    self.assertEqual(replayed.content, recorded.content)
+    self.assertEqual([response.status_code for response in replayed.history], [302])
+
+  def test_replay_miss(self):
+    http_fixtures.MODE = 'replay'
+    self.assertRaises(requests.ConnectionError, requests.get, 'http://127.0.0.1:1/missing')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,135 @@
+# coding: utf-8
+import os
+import re
+import unittest
+
+from ca_nl_municipalities.people import municipal_rows
+from ca_sk_municipalities.people import split_districts
+from ca_yt_municipalities.people import name_column
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def read(name):
+  with open(os.path.join(DATA_DIR, name)) as f:
+    return f.read()
+
+
+def yukon_municipalities():
+  municipalities = []
+  for municipality in re.split(r'\n\s*\n', read('ca_yt_municipalities.txt')):
+    if not 'Councillors' in municipality:
+      continue
+    lines = municipality.split('\n')
+    if 'Page' in lines[0]:
+      lines.pop(0)
+    municipalities.append(lines)
+  return municipalities
+
+
+def saskatchewan_pages():
+  pages = []
+  page = []
+  for line in read('ca_sk_municipalities.txt').splitlines(True):
+    if line.strip() and not 'Page' in line and not 'CITIES' in line:
+      page.append(line)
+    elif page:
+      pages.append(page)
+      page = []
+  return pages
+
+
+def newfoundland_and_labrador_pages():
+  return read('ca_nl_municipalities.txt').split('Municipal Directory')[1:]
+
+
+# The splitters that detect_columns replaced, which found the columns from the
+# gaps in each municipality's or page's first line.
+
+def old_name_column(lines):
+  col1end = re.search(r'\s{2,}(\w)', lines[0].strip()).end()
+  col2end = re.search(r':\s{2,}(\w)', lines[0].strip()).end()
+  return col1end - 1, col2end - 1
+
+
+def old_split_districts(page):
+  index = re.search(r'(\s{6,})', page[0])
+  if index:
+    index = index.end() - 1
+  else:
+    index = -1
+  dist1 = []
+  dist2 = []
+  for line in page:
+    dist1.append(line[:index].strip())
+    dist2.append(line[index:].strip())
+  return [dist1, dist2]
+
+
+def old_municipal_rows(page):
+  page = page.splitlines(True)
+  column_index = {}
+  for line in page:
+    if 'Official Name' in line:
+      column_index['dist_end'] = re.search('Region', line).start()
+      column_index['name_start'] = re.search('Mayor', line).start() + 1
+      column_index['name_end'] = re.search('Clerk', line).start() - 1
+      column_index['phone_start'] = re.search('Line 1', line).start()
+      column_index['phone_end'] = re.search('Line 2', line).start() - 1
+      column_index['fax_start'] = re.search('Fax', line).start()
+      column_index['fax_end'] = re.search('E-mail', line).start() - 2
+      column_index['email_start'] = column_index['fax_end'] + 1
+      column_index['email_end'] = re.search('Address', line).start() - 1
+      column_index['address_start'] = column_index['email_end'] + 1
+      column_index['address_end'] = re.search('Days', line).start() - 1
+      break
+  rows = []
+  for line in page:
+    if 'Official Name' in line or not line.strip():
+      continue
+    rows.append({
+      'district': line[:column_index['dist_end']].strip(),
+      'name': line[column_index['name_start']:column_index['name_end']].strip(),
+      'phone': line[column_index['phone_start']:column_index['phone_end']].strip(),
+      'fax': line[column_index['fax_start']:column_index['fax_end']].strip(),
+      'email': line[column_index['email_start']:column_index['email_end']].strip(),
+      'address': line[column_index['address_start']:column_index['address_end']].strip(),
+    })
+  return rows
+
+
+class MunicipalColumnsTestCase(unittest.TestCase):
+
+  def test_yukon(self):
+    municipalities = yukon_municipalities()
+    self.assertEqual(len(municipalities), 5)
+    for lines in municipalities:
+      self.assertEqual(name_column(lines), old_name_column(lines))
+
+  def test_yukon_single_column(self):
+    self.assertIsNone(name_column(['Town of Faro', 'Box 580']))
+
+  def test_saskatchewan(self):
+    pages = saskatchewan_pages()
+    self.assertEqual(len(pages), 3)
+    for page in pages:
+      # The old splitter returned an empty district for a page with one district.
+      self.assertEqual(split_districts(page), [district for district in old_split_districts(page) if any(district)])
+
+  def test_newfoundland_and_labrador(self):
+    pages = newfoundland_and_labrador_pages()
+    self.assertEqual(len(pages), 2)
+    for page in pages:
+      self.assertEqual(municipal_rows(page), old_municipal_rows(page))
+
+  def test_newfoundland_and_labrador_merged_columns(self):
+    # An e-mail address leaves no gutter before the Address column, so the
+    # E-mail and Address labels share a detected column.
+    page = newfoundland_and_labrador_pages()[1]
+    rows = [row for row in municipal_rows(page) if row['name']]
+    self.assertEqual(rows[1]['email'], 'lewisporte@lewisporte.nfld.ca')
+    self.assertEqual(rows[1]['address'], 'PO Box 219  Lewisporte')
+
+
+if __name__ == '__main__':
+  unittest.main()
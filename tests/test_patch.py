@@ -0,0 +1,74 @@
+# coding: utf-8
+import unittest
+
+from validictory.validator import SchemaError
+
+import patch
+
+
+class InterpretedValidator(patch.DatetimeValidator):
+  _SchemaValidator__validate = patch.interpreted_validate
+
+
+# Exercises each keyword that patch.py compiles.
+schema = {
+  'type': 'object',
+  'properties': {
+    'name': {'type': 'string', 'blank': False},
+    'gender': {'type': ['string', 'null'], 'enum': ['male', 'female', None]},
+    'links': {
+      'type': 'array',
+      'items': {
+        'type': 'object',
+        'properties': {
+          'url': {'type': 'string', 'required': True},
+          'note': {'type': ['string', 'null']},
+        },
+        'additionalProperties': False,
+      },
+    },
+  },
+}
+
+invalid_objects = [
+  (schema, {'name': ''}),
+  (schema, {'name': 1}),
+  (schema, {'name': 'Jane', 'gender': 'F'}),
+  (schema, {'name': 'Jane', 'gender': ['female']}),
+  (schema, {'name': 'Jane', 'links': [{'note': None}]}),
+  (schema, {'name': 'Jane', 'links': [{'url': 'http://example.com', 'title': 'Example'}]}),
+  (schema, {'name': 'Jane', 'links': {}}),
+  (patch.person_schema, {'name': ''}),
+  (patch.organization_schema, {'name': 1}),
+  (patch.membership_schema, {'organization_id': 'party:ndp', 'person_id': 'person:1', 'role': 'member', 'contact_details': [{'type': 'telephone', 'value': '', 'note': 'home'}]}),
+]
+
+
+def error(validator_class, data, schema):
+  try:
+    validator_class(required_by_default=False).validate(data, schema)
+  except (SchemaError, ValueError) as e:
+    return '%s: %s' % (e.__class__.__name__, e)
+
+
+class CompiledSchemasTestCase(unittest.TestCase):
+
+  def test_errors(self):
+    for schema, data in invalid_objects:
+      expected = error(InterpretedValidator, data, schema)
+      self.assertIsNotNone(expected, data)
+      self.assertEqual(error(patch.DatetimeValidator, data, schema), expected)
+
+  def test_schema_errors(self):
+    for schema in (['not', 'a', 'dict'], {'type': 'string', 'optional': True}, {'type': 'string', 'requires': 'name'}):
+      self.assertEqual(error(patch.DatetimeValidator, 'Jane', schema), error(InterpretedValidator, 'Jane', schema))
+
+  def test_memo_size(self):
+    patch.compiled_schemas_memo.clear()
+    for i in range(patch.COMPILED_SCHEMAS_MEMO_SIZE + 1):
+      patch.DatetimeValidator(required_by_default=False).validate('Jane', {'type': 'string', 'title': str(i)})
+    self.assertTrue(len(patch.compiled_schemas_memo) <= patch.COMPILED_SCHEMAS_MEMO_SIZE)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,84 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+import unittest
+
+import utils
+
+
+def pdf(strings):
+  """
+  Returns a one-page PDF that draws each `(x, y, text)` string in 10 point
+  Helvetica.
+  """
+  stream = ''.join('BT /F1 10 Tf %d %d Td (%s) Tj ET\n' % string for string in strings)
+  objects = [
+    '<< /Type /Catalog /Pages 2 0 R >>',
+    '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+    '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>',
+    '<< /Length %d >>\nstream\n%sendstream' % (len(stream), stream),
+    '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+  ]
+  content = '%PDF-1.4\n'
+  offsets = []
+  for i, obj in enumerate(objects, 1):
+    offsets.append(len(content))
+    content += '%d 0 obj\n%s\nendobj\n' % (i, obj)
+  xref = len(content)
+  content += 'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+  content += ''.join('%010d 00000 n \n' % offset for offset in offsets)
+  content += 'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+  return content
+
+
+# Two blocks of a table, and a block below them, separated by a blank line.
+table = pdf([
+  (72, 700, 'Name'), (200, 700, 'Phone'),
+  (72, 688, 'Jane Smith'), (200, 688, '555-1234'),
+  (72, 676, 'Bob'), (200, 676, '555-9876'),
+  (72, 652, 'Total'),
+])
+
+
+class PDFTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.pdf_cache_dir = utils.PDF_CACHE_DIR
+    utils.PDF_CACHE_DIR = tempfile.mkdtemp()
+    utils.pdf_pages_memo.clear()
+
+  def tearDown(self):
+    shutil.rmtree(utils.PDF_CACHE_DIR)
+    utils.PDF_CACHE_DIR = self.pdf_cache_dir
+    utils.pdf_pages_memo.clear()
+
+  def test_pdf_lines(self):
+    lines = utils.pdf_lines(utils.pdf_pages(table)[0])
+    # A block starts three columns after the widest line of the block to its left.
+    self.assertEqual([(x0, 792 - y, size, column, text) for x0, y, size, column, text in lines], [
+      (72, 700, 10, 0, 'Name'), (200, 700, 10, 13, 'Phone'),
+      (72, 688, 10, 0, 'Jane Smith'), (200, 688, 10, 13, '555-1234'),
+      (72, 676, 10, 0, 'Bob'), (200, 676, 10, 13, '555-9876'),
+      (72, 652, 10, 0, 'Total'),
+    ])
+
+  def test_pdf_to_text(self):
+    self.assertEqual(utils.pdf_to_text(table, layout=True), 'Name         Phone\nJane Smith   555-1234\nBob          555-9876\n\nTotal\n\f')
+    # Without layout, blocks are in pdfminer's reading order, left column first.
+    self.assertEqual(utils.pdf_to_text(table), 'Name\nJane Smith\nBob\n\nTotal\n\nPhone\n555-1234\n555-9876\n\n\f')
+
+  def test_cache(self):
+    text = utils.pdf_to_text(table, layout=True)
+    self.assertEqual(os.listdir(utils.PDF_CACHE_DIR), ['%s.json' % utils.hashlib.sha1(table).hexdigest()])
+    utils.pdf_pages_memo.clear()
+    extract_pdf_pages = utils.extract_pdf_pages
+    utils.extract_pdf_pages = None
+    try:
+      self.assertEqual(utils.pdf_to_text(table, layout=True), text)
+    finally:
+      utils.extract_pdf_pages = extract_pdf_pages
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,20 +1,41 @@
 # coding: utf-8
+import atexit
 import codecs
+from contextlib import contextmanager
 import cStringIO
 import csv
 from ftplib import FTP
+import hashlib
+import json
+import logging
+import math
+from multiprocessing.pool import ThreadPool
+import os
 import re
-from StringIO import StringIO
+import sys
+import tempfile
+import threading
+import time
 from urlparse import urlparse
 
 import lxml.html
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LAParams, LTChar, LTTextBox, LTTextLine
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.utils import apply_matrix_pt
 import requests
+from requests.adapters import HTTPAdapter
 from scrapelib import Scraper as Scrapelib
 from pupa.scrape import Scraper, Jurisdiction, Legislator
 from pupa.models import Membership, Person
 
+import http_fixtures
+import instrumentation
 import patch
 
+http_fixtures.install()
+
 CONTACT_DETAIL_TYPE_MAP = {
   u'Address': 'address',
   u'bb': 'cell',
@@ -96,7 +117,9 @@ class UnicodeReader:
     """
 
     def __init__(self, f, dialect=csv.excel, encoding="utf-8", **kwds):
-        f = UTF8Recoder(f, encoding)
+        # UTF-8 input needs no recoding.
+        if codecs.lookup(encoding).name != 'utf-8':
+            f = UTF8Recoder(f, encoding)
         self.reader = csv.DictReader(f, dialect=dialect, **kwds)
 
     def next(self):
@@ -114,27 +137,27 @@ class CanadianJurisdiction(Jurisdiction):
   }]
 
   def __init__(self):
-    for scraper_type in ('bills', 'events', 'people', 'speeches', 'votes'):
-      try:
-        __import__(self.__module__ + '.' + scraper_type)
-      except ImportError as e:
-        if 'No module named %s' % scraper_type in e.args:
-          pass
-        else:
-          raise
-      else:
-        self.provides.append(scraper_type)
+    http_fixtures.jurisdiction = self.__module__
+    # Scraper modules are imported only when their scrapers are run.
+    directory = os.path.dirname(sys.modules[self.__module__].__file__)
+    self.provides = [scraper_type for scraper_type in ('bills', 'events', 'people', 'speeches', 'votes') if os.path.exists(os.path.join(directory, '%s.py' % scraper_type))]
+    self.scraper_classes = {}
 
   def get_scraper(self, session, scraper_type):
     if scraper_type in self.provides:
-      class_name = self.__class__.__name__ + {
-        'bills': 'Bill',
-        'events': 'Event',
-        'people': 'Person',
-        'speeches': 'Speech',
-        'votes': 'Vote',
-      }[scraper_type] + 'Scraper'
-      return getattr(__import__(self.__module__ + '.' + scraper_type, fromlist=[class_name]), class_name)
+      if scraper_type not in self.scraper_classes:
+        class_name = self.__class__.__name__ + {
+          'bills': 'Bill',
+          'events': 'Event',
+          'people': 'Person',
+          'speeches': 'Speech',
+          'votes': 'Vote',
+        }[scraper_type] + 'Scraper'
+        scraper_class = getattr(__import__(self.__module__ + '.' + scraper_type, fromlist=[class_name]), class_name)
+        if instrumentation.ENABLED and scraper_type == 'people':
+          scraper_class = instrumentation.instrument_scraper(scraper_class, self.__module__)
+        self.scraper_classes[scraper_type] = scraper_class
+      return self.scraper_classes[scraper_type]
 
   def scrape_session_list(self):
     return ['N/A']
@@ -157,6 +180,14 @@ class CanadianLegislator(Legislator):
     super(CanadianLegislator, self).__setattr__(name, value)
 
   def add_link(self, url, note=None):
+      if instrumentation.ENABLED:
+        if url.startswith('www.'):
+          instrumentation.recorder.link('scheme')
+        elif re.match(r'\A@[A-Za-z]+\Z', url):
+          instrumentation.recorder.link('twitter')
+        else:
+          instrumentation.recorder.link('unchanged')
+
       if url.startswith('www.'):
         url = 'http://%s' % url
       if re.match(r'\A@[A-Za-z]+\Z', url):
@@ -176,6 +207,9 @@ class CanadianLegislator(Legislator):
 
     type = type.lower()
 
+    if instrumentation.ENABLED:
+      raw = value
+
     if type in ('text', 'voice', 'fax', 'cell', 'video', 'pager'):
       value = clean_telephone_number(clean_string(value))
     elif type == 'address':
@@ -183,6 +217,13 @@ class CanadianLegislator(Legislator):
     else:
       value = clean_string(value)
 
+    if instrumentation.ENABLED:
+      if type in ('text', 'voice', 'fax', 'cell', 'video', 'pager'):
+        outcome = normalize_telephone_number(clean_string(raw))[1] or 'normalized'
+      else:
+        outcome = 'unchanged' if value == raw else 'cleaned'
+      instrumentation.recorder.contact(type, outcome)
+
     self._contact_details.append({'type': type, 'value': value, 'note': note})
 
 
@@ -207,7 +248,11 @@ class AggregationLegislator(Person):
     super(AggregationLegislator, self).__setattr__(name, value)
 
 
-whitespace_re = re.compile(r'[^\S\n]+', flags=re.U)
+# Matches runs of whitespace, with or without a newline.
+space_re = re.compile(r'[^\S\n]*\n[^\S\n]*|[^\S\n]+', flags=re.U)
+# Matches anything that clean_string would change. Most strings, including
+# strings that were already cleaned, have nothing to change.
+unclean_re = re.compile(u'[\u200b\u2019\xc2]|[^\\S \\n]|  | \\n|\\n |\\A\\s|\\s\\Z', flags=re.U)
 honorific_prefix_re = re.compile(r'\A(?:Councillor|Dr|Hon|M|Mayor|Mme|Mr|Mrs|Ms|Miss)\.? ')
 honorific_suffix_re = re.compile(r', Ph\.D\Z')
 
@@ -237,9 +282,29 @@ abbreviations = {
   u'PEI': 'PE',
 }
 
+extension_re = re.compile(r'(?:/|x|ext[.:]?|poste)[\s-]?(?=\b|\d)', flags=re.IGNORECASE)
+non_digit_re = re.compile(r'\D')
+postal_code_re = re.compile(r'\b[A-Z][O0-9][A-Z]\s?[O0-9][A-Z][O0-9]\b')
+# Matches a province or territory name at the end of an address, optionally
+# followed by the country and postal code.
+province_re = re.compile(r'[,\n ]+\(?(' + '|'.join(re.escape(k) for k in abbreviations) + r')\)?(?=(?:[,\n ]+Canada)?(?:[,\n ]+[A-Z][0-9][A-Z]\s?[0-9][A-Z][0-9])?\Z)')
+last_line_re = re.compile(r'[,\n ]+([A-Z]{2})(?:[,\n ]+Canada)?[,\n ]+([A-Z][0-9][A-Z])\s?([0-9][A-Z][0-9])\Z')
+
+CLEAN_ADDRESS_MEMO_SIZE = 1024
+clean_address_memo = {}
+
+
+def replace_space(match):
+  if '\n' in match.group(0):
+    return '\n'
+  return ' '
+
 
 def clean_string(s):
-  return re.sub(r' *\n *', '\n', whitespace_re.sub(' ', unicode(s).translate(table)).strip())
+  s = unicode(s)
+  if not unclean_re.search(s):
+    return s
+  return space_re.sub(replace_space, s.translate(table).strip())
 
 
 def clean_name(s):
@@ -252,44 +317,433 @@ def clean_telephone_number(s):
   @see http://www.noslangues-ourlanguages.gc.ca/bien-well/fra-eng/typographie-typography/telephone-eng.html
   """
 
-  splits = re.split(r'(?:/|x|ext[.:]?|poste)[\s-]?(?=\b|\d)', s, flags=re.IGNORECASE)
-  digits = re.sub(r'\D', '', splits[0])
+  return normalize_telephone_number(s)[0]
+
+
+def clean_telephone_numbers(values):
+
+  """
+  Normalizes a list of telephone numbers, like all of a council's numbers, and
+  returns a list of `(value, reason)` tuples. If a number is normalized, its
+  reason is None. Otherwise, its value is unchanged, and its reason is one of:
+
+  * `extensions`: it has more than one extension
+  * `length`: it doesn't have 10 digits, or 11 digits with a country code
+  * `country`: its country code isn't 1
+  """
+
+  return [normalize_telephone_number(value) for value in values]
+
+
+def normalize_telephone_number(s):
+  splits = extension_re.split(s)
+  digits = non_digit_re.sub('', splits[0])
 
   if len(digits) == 10:
     digits = '1' + digits
 
-  if len(digits) == 11 and digits[0] == '1' and len(splits) <= 2:
-    digits = re.sub(r'\A(\d)(\d{3})(\d{3})(\d{4})\Z', r'\1-\2-\3-\4', digits)
-    if len(splits) == 2:
-      return '%s x%s' % (digits, splits[1])
-    else:
-      return digits
+  if len(splits) > 2:
+    return (s, 'extensions')
+  if len(digits) != 11:
+    return (s, 'length')
+  if digits[0] != '1':
+    return (s, 'country')
+
+  digits = '%s-%s-%s-%s' % (digits[0], digits[1:4], digits[4:7], digits[7:])
+  if len(splits) == 2:
+    return ('%s x%s' % (digits, splits[1]), None)
   else:
-    return s
+    return (digits, None)
 
 
 def clean_address(s):
 
   """
   Corrects the postal code, abbreviates the province or territory name, and
-  formats the last line of the address.
+  formats the last line of the address. Memoized, because the same office
+  address is often repeated for each representative.
   """
 
+  if s not in clean_address_memo:
+    if len(clean_address_memo) >= CLEAN_ADDRESS_MEMO_SIZE:
+      clean_address_memo.clear()
+    clean_address_memo[s] = format_address(s)
+  return clean_address_memo[s]
+
+
+def format_address(s):
   # The letter "O" instead of the numeral "0" is a common mistake.
-  s = re.sub(r'\b[A-Z][O0-9][A-Z]\s?[O0-9][A-Z][O0-9]\b', lambda x: x.group(0).replace('O', '0'), clean_string(s))
-  for k, v in abbreviations.iteritems():
-      s = re.sub(r'[,\n ]+\(?' + k + r'\)?(?=(?:[,\n ]+Canada)?(?:[,\n ]+[A-Z][0-9][A-Z]\s?[0-9][A-Z][0-9])?\Z)', ' ' + v, s)
-  return re.sub(r'[,\n ]+([A-Z]{2})(?:[,\n ]+Canada)?[,\n ]+([A-Z][0-9][A-Z])\s?([0-9][A-Z][0-9])\Z', r' \1  \2 \3', s)
+  s = postal_code_re.sub(lambda x: x.group(0).replace('O', '0'), clean_string(s))
+  s = province_re.sub(lambda x: ' ' + abbreviations[x.group(1)], s)
+  return last_line_re.sub(r' \1  \2 \3', s)
+
+
+# One adapter, and thus one pool of keep-alive connections per host, is shared
+# by every session in the process. POOL_CONNECTIONS is the number of hosts for
+# which to keep a pool, and POOL_MAXSIZE is the number of connections per host.
+POOL_CONNECTIONS = 100
+POOL_MAXSIZE = 4
+
+http_adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+sessions_memo = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(user_agent=requests.utils.default_user_agent()):
+
+  """
+  Returns the process's shared session for the user agent. Scrapers should use
+  it instead of calling `requests` or `urllib2` directly, so that connections
+  are reused across pages and across scrapers.
+  """
+
+  with sessions_lock:
+    if user_agent not in sessions_memo:
+      session = Scrapelib(follow_robots=False, requests_per_minute=0)
+      session.user_agent = user_agent
+      session.mount('http://', http_adapter)
+      session.mount('https://', http_adapter)
+      sessions_memo[user_agent] = session
+    return sessions_memo[user_agent]
+
+
+def connection_stats():
+
+  """
+  Returns the number of requests sent and of connections opened and reused by
+  the shared sessions, in total and per host.
+  """
+
+  stats = {'requests': 0, 'opened': 0, 'reused': 0, 'hosts': {}}
+  pools = http_adapter.poolmanager.pools
+  for key in pools.keys():
+    pool = pools[key]
+    host = {
+      'requests': pool.num_requests,
+      'opened': pool.num_connections,
+      'reused': max(pool.num_requests - pool.num_connections, 0),
+    }
+    stats['hosts']['%s://%s' % (pool.scheme, pool.host)] = host
+    for k, v in host.items():
+      stats[k] += v
+  return stats
+
+
+# Response bodies are cached in HTTP_CACHE_DIR, up to HTTP_CACHE_SIZE bytes. Set
+# the HTTP_CACHE_DIR environment variable to an empty string to disable caching.
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', 'http_cache')
+HTTP_CACHE_SIZE = int(os.getenv('HTTP_CACHE_SIZE', 256 * 1024 * 1024))
+
+
+class HTTPCache(object):
+
+  """
+  An on-disk cache of response bodies keyed by URL. A cached response is
+  revalidated with If-None-Match and If-Modified-Since, so that an unchanged
+  page costs a 304 instead of a full download. Once the cache exceeds
+  `max_size` bytes, the least recently used responses are evicted.
+  """
+
+  def __init__(self, directory, max_size):
+    self.directory = directory
+    self.max_size = max_size
+    self.size = None
+    self.lock = threading.Lock()
+    self.counts = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes_saved': 0}
+
+  def path(self, url):
+    if isinstance(url, unicode):
+      url = url.encode('utf-8')
+    return os.path.join(self.directory, hashlib.sha1(url).hexdigest())
+
+  def count(self, key, n=1):
+    with self.lock:
+      self.counts[key] += n
+
+  def request(self, session, url, **kwargs):
+    """
+    Sends a GET request, which is conditional if the URL is cached. Returns the
+    response and, if the response is a 304, the cached metadata and an open file
+    of the cached body.
+    """
+    path = self.path(url)
+    try:
+      with open(path + '.json') as f:
+        meta = json.load(f)
+      # Open the body now, in case another process evicts it.
+      body = open(path, 'rb')
+    except (IOError, ValueError):
+      meta = body = None
+
+    if meta:
+      headers = dict(kwargs.pop('headers', None) or {})
+      if meta['etag']:
+        headers['If-None-Match'] = meta['etag']
+      if meta['last_modified']:
+        headers['If-Modified-Since'] = meta['last_modified']
+      kwargs['headers'] = headers
+
+    try:
+      response = session.get(url, **kwargs)
+    except:
+      if body:
+        body.close()
+      raise
+
+    if meta and response.status_code == 304:
+      self.count('hits')
+      for name in (path, path + '.json'):
+        try:
+          os.utime(name, None)  # Mark as recently used.
+        except OSError:
+          pass
+      return response, meta, body
+
+    if body:
+      body.close()
+    self.count('misses')
+    return response, None, None
+
+  def cacheable(self, response):
+    return response.status_code == 200 and bool(response.headers.get('etag') or response.headers.get('last-modified'))
+
+  def get(self, session, url, **kwargs):
+    response, meta, body = self.request(session, url, **kwargs)
+    if meta:
+      with body:
+        content = body.read()
+      self.count('bytes_saved', len(content))
+      cached = requests.models.Response()
+      cached._content = content
+      cached.status_code = 200
+      cached.headers['content-type'] = meta['content_type']
+      cached.encoding = meta['encoding']
+      cached.url = url
+      return cached
+    if self.cacheable(response):
+      for _ in self.write(url, response, [response.content]):
+        pass
+    return response
+
+  def iter_content(self, session, url, chunk_size, **kwargs):
+    """
+    Like `get`, but yields the body in chunks as it is downloaded or read from
+    the cache.
+    """
+    response, meta, body = self.request(session, url, stream=True, **kwargs)
+    if meta:
+      with body:
+        for chunk in iter(lambda: body.read(chunk_size), ''):
+          self.count('bytes_saved', len(chunk))
+          yield chunk
+    elif self.cacheable(response):
+      for chunk in self.write(url, response, response.iter_content(chunk_size)):
+        yield chunk
+    else:
+      for chunk in response.iter_content(chunk_size):
+        yield chunk
+
+  def write(self, url, response, chunks):
+    """
+    Writes the response's body to the cache as its chunks are consumed, and
+    yields the chunks.
+    """
+    if not os.path.isdir(self.directory):
+      try:
+        os.makedirs(self.directory)
+      except OSError:  # Another thread or process created it.
+        pass
+    path = self.path(url)
+    meta = {
+      'url': url,
+      'etag': response.headers.get('etag'),
+      'last_modified': response.headers.get('last-modified'),
+      'content_type': response.headers.get('content-type'),
+      'encoding': response.encoding,
+    }
+    # Write to temporary files, in case other threads or processes are reading.
+    tmp = '%s.%d.%d' % (path, os.getpid(), threading.current_thread().ident)
+    size = 0
+    try:
+      with open(tmp, 'wb') as f:
+        for chunk in chunks:
+          f.write(chunk)
+          size += len(chunk)
+          yield chunk
+    except:
+      os.remove(tmp)
+      raise
+    # The response may replace a cached response.
+    old_size = self.entry_size(path)
+    os.rename(tmp, path)
+    with open(tmp, 'w') as f:
+      json.dump(meta, f)
+      size += f.tell()
+    os.rename(tmp, path + '.json')
+
+    with self.lock:
+      if self.size is None:
+        self.size = self.disk_usage()[0]
+      else:
+        self.size += size - old_size
+      if self.size > self.max_size:
+        self.evict()
+
+  def entry_size(self, path):
+    """
+    Returns the size of a cached response's body and metadata.
+    """
+    size = 0
+    for name in (path, path + '.json'):
+      try:
+        size += os.path.getsize(name)
+      except OSError:  # Not cached, or evicted by another process.
+        pass
+    return size
+
+  def disk_usage(self):
+    """
+    Returns the total size of the cached responses, including their metadata,
+    and the responses' paths from least to most recently used.
+    """
+    entries = []
+    size = 0
+    for name in os.listdir(self.directory):
+      if len(name) == 40:  # A SHA-1 hex digest, not metadata or a temporary file.
+        path = os.path.join(self.directory, name)
+        try:
+          mtime = os.path.getmtime(path)
+        except OSError:  # Evicted by another process.
+          continue
+        length = self.entry_size(path)
+        entries.append((mtime, length, path))
+        size += length
+    return size, [(path, length) for _, length, path in sorted(entries)]
+
+  def evict(self):
+    size, entries = self.disk_usage()
+    for path, length in entries:
+      if size <= self.max_size:
+        break
+      for name in (path, path + '.json'):
+        try:
+          os.remove(name)
+        except OSError:
+          pass
+      size -= length
+      self.counts['evictions'] += 1
+    self.size = size
+
+  def report(self):
+    counts = dict(self.counts)
+    counts['requests'] = counts['hits'] + counts['misses']
+    return 'HTTP cache: %(requests)d requests, %(hits)d hits, %(misses)d misses, %(evictions)d evictions, %(bytes_saved)d bytes saved' % counts
+
+
+# Recorded and replayed responses must be complete, not 304s.
+http_cache = HTTPCache(HTTP_CACHE_DIR, HTTP_CACHE_SIZE) if HTTP_CACHE_DIR and not http_fixtures.MODE else None
+
+
+@atexit.register
+def report_http_cache():
+  if http_cache and http_cache.counts['hits'] + http_cache.counts['misses']:
+    logging.getLogger(__name__).info(http_cache.report())
+
+
+def http_get(url, user_agent=requests.utils.default_user_agent(), **kwargs):
+
+  """
+  GETs the URL with the shared session, through the HTTP cache if enabled.
+  """
+
+  session = get_session(user_agent)
+  if http_cache:
+    return http_cache.get(session, url, **kwargs)
+  else:
+    return session.get(url, **kwargs)
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def http_iter_content(url, user_agent=requests.utils.default_user_agent(), **kwargs):
+
+  """
+  GETs the URL like `http_get`, but yields the body in chunks as it downloads.
+  """
+
+  session = get_session(user_agent)
+  if http_cache:
+    return http_cache.iter_content(session, url, CHUNK_SIZE, **kwargs)
+  else:
+    return session.get(url, stream=True, **kwargs).iter_content(CHUNK_SIZE)
+
+
+def ftp_iter_content(url):
+
+  """
+  Retrieves the file at the FTP URL, and yields its content in chunks as it
+  downloads.
+  """
+
+  if http_fixtures.MODE:
+    return http_fixtures.iter_content(url, lambda: ftp_retrieve(url))
+  return ftp_retrieve(url)
+
+
+def ftp_retrieve(url):
+  result = urlparse(url)
+  ftp = FTP(result.hostname)
+  ftp.login(result.username, result.password)
+  try:
+    ftp.voidcmd('TYPE I')
+    conn = ftp.transfercmd('RETR %s' % result.path)
+    try:
+      for chunk in iter(lambda: conn.recv(CHUNK_SIZE), ''):
+        yield chunk
+    finally:
+      conn.close()
+    ftp.voidresp()
+  finally:
+    ftp.close()
+
+
+def iter_lines(chunks, encoding=None):
+
+  """
+  Splits chunks of bytes into lines, keeping line endings. If an encoding is
+  given, recodes each chunk from that encoding to UTF-8.
+  """
+
+  if encoding:
+    decoder = codecs.getincrementaldecoder(encoding)()
+  pending = ''
+  for chunk in chunks:
+    if encoding:
+      chunk = decoder.decode(chunk).encode('utf-8')
+    lines = (pending + chunk).splitlines(True)
+    # The last line may continue in the next chunk, as may a trailing "\r".
+    pending = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+    for line in lines:
+      yield line
+  if encoding:
+    pending += decoder.decode('', True).encode('utf-8')
+  if pending:
+    yield pending
 
 
 def lxmlize(url, encoding='utf-8', user_agent=requests.utils.default_user_agent()):
-  scraper = Scrapelib(follow_robots=False, requests_per_minute=0)
-  scraper.user_agent = user_agent
-  entry = scraper.urlopen(url)
+  start = time.time()
+  response = http_get(url, user_agent)
+  response.raise_for_status()
+  http_time = time.time() - start
+  entry = response.text
   if encoding != 'utf-8' or not isinstance(entry, unicode):
     entry = entry.encode(encoding)
   page = lxml.html.fromstring(entry)
   meta = page.xpath('//meta[@http-equiv="refresh"]')
+  if instrumentation.ENABLED:
+    instrumentation.recorder.page(url, len(response.content), start, http_time, time.time() - start - http_time, len(response.history), bool(meta))
   if meta:
     _, url = meta[0].attrib['content'].split('=', 1)
     return lxmlize(url, encoding)
@@ -298,18 +752,361 @@ def lxmlize(url, encoding='utf-8', user_agent=requests.utils.default_user_agent(
     return page
 
 
+class HostLimiter(object):
+
+  """
+  Limits the number of concurrent requests to each host and, if
+  `requests_per_minute` is set, the rate of requests to each host.
+  """
+
+  def __init__(self, concurrency=POOL_MAXSIZE, requests_per_minute=0):
+    self.concurrency = concurrency
+    self.interval = 60.0 / requests_per_minute if requests_per_minute else 0
+    self.lock = threading.Lock()
+    self.semaphores = {}
+    self.next_request = {}
+
+  @contextmanager
+  def limit(self, url):
+    host = urlparse(url).netloc
+    with self.lock:
+      if host not in self.semaphores:
+        self.semaphores[host] = threading.Semaphore(self.concurrency)
+      semaphore = self.semaphores[host]
+    with semaphore:
+      if self.interval:
+        with self.lock:
+          now = time.time()
+          at = max(now, self.next_request.get(host, now))
+          self.next_request[host] = at + self.interval
+        if at > now:
+          time.sleep(at - now)
+      yield
+
+
+def lxmlize_many(urls, encoding='utf-8', user_agent=requests.utils.default_user_agent(), workers=8, per_host=POOL_MAXSIZE, requests_per_minute=0):
+
+  """
+  Fetches and parses the pages at the URLs using a pool of threads, and returns
+  the pages in the same order as the URLs. Use it to prefetch detail pages
+  before yielding legislators in the order of an index page.
+  """
+
+  urls = list(urls)
+  if not urls:
+    return []
+  limiter = HostLimiter(per_host, requests_per_minute)
+
+  def fetch(url):
+    with limiter.limit(url):
+      return lxmlize(url, encoding, user_agent)
+
+  pool = ThreadPool(min(workers, len(urls)))
+  try:
+    return pool.map(fetch, urls)
+  finally:
+    pool.close()
+    pool.join()
+
+
 def csv_reader(url, header=False, encoding='utf-8', **kwargs):
-  result = urlparse(url)
-  if result.scheme == 'ftp':
-    data = StringIO()
-    ftp = FTP(result.hostname)
-    ftp.login(result.username, result.password)
-    ftp.retrbinary('RETR %s' % result.path, lambda block: data.write(block))
-    ftp.quit()
-    data.seek(0)
+
+  """
+  Reads a remote CSV file, parsing rows as the file downloads. If `header` is
+  set, yields dicts of unicode strings; otherwise, yields lists of bytes. If
+  SCRAPER_INSTRUMENTATION is set, returns a generator of the reader's rows
+  instead of the reader, in order to count the rows.
+  """
+
+  if urlparse(url).scheme == 'ftp':
+    chunks = ftp_iter_content(url)
   else:
-    data = StringIO(requests.get(url, **kwargs).content)
+    chunks = http_iter_content(url, **kwargs)
+  if instrumentation.ENABLED:
+    chunks, count_rows = instrumentation.count_csv(url, chunks)
   if header:
-    return UnicodeReader(data, encoding=encoding)
+    # Recode to UTF-8 once per chunk, instead of once per line in UnicodeReader.
+    if codecs.lookup(encoding).name == 'utf-8':
+      lines = iter_lines(chunks)
+    else:
+      lines = iter_lines(chunks, encoding)
+    reader = UnicodeReader(lines)
   else:
-    return csv.reader(data)
+    reader = csv.reader(iter_lines(chunks))
+  if instrumentation.ENABLED:
+    return count_rows(reader)
+  return reader
+
+
+# Extracted PDF text is cached in PDF_CACHE_DIR by the PDF's SHA-1. Set the
+# PDF_CACHE_DIR environment variable to an empty string to disable caching.
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', 'pdf_cache')
+
+pdf_pages_memo = {}
+
+
+class PDFLineAggregator(PDFPageAggregator):
+
+  """
+  Records each character's font size and baseline, which pdfminer's bounding
+  boxes don't keep, and which `pdftotext -layout` uses to break lines.
+  """
+
+  def render_char(self, matrix, font, fontsize, scaling, rise, cid):
+    adv = PDFPageAggregator.render_char(self, matrix, font, fontsize, scaling, rise, cid)
+    item = self.cur_item._objs[-1]
+    item.fontsize = fontsize * math.hypot(matrix[2], matrix[3])
+    item.base = apply_matrix_pt(matrix, (0, rise))[1]
+    return adv
+
+
+def extract_pdf_pages(content):
+  resource_manager = PDFResourceManager(caching=True)
+  device = PDFLineAggregator(resource_manager, laparams=LAParams())
+  interpreter = PDFPageInterpreter(resource_manager, device)
+  pages = []
+  for page in PDFPage.get_pages(cStringIO.StringIO(content)):
+    interpreter.process_page(page)
+    blocks = []
+    for box in device.get_result():
+      if isinstance(box, LTTextBox):
+        lines = []
+        for line in box:
+          if isinstance(line, LTTextLine):
+            text = u''
+            edges = []
+            right = line.x0
+            base = None
+            size = 0
+            for item in line:
+              if isinstance(item, LTChar):
+                text += item.get_text()
+                edges += [item.x0] * len(item.get_text())
+                right = item.x1
+                if base is None:
+                  base = item.base
+                size = max(size, item.fontsize)
+              elif item.get_text() == u' ':  # A space between words.
+                text += u' '
+                edges.append(right)
+            if text.strip():
+              edges.append(line.x1)
+              # Baselines are measured from the top of the page.
+              lines.append((line.x0, line.x1, page.mediabox[3] - base, size, text, edges))
+        if lines:
+          blocks.append(lines)
+    pages.append(blocks)
+  device.close()
+  return pages
+
+
+def pdf_pages(content):
+
+  """
+  Extracts the text of a PDF from its content, and returns a list of pages.
+  Each page is a list of blocks of text in reading order. Each block is a list
+  of `(x0, x1, y, size, text, edges)` lines, where `x0` and `x1` are the line's
+  left and right, `y` is its baseline from the page's top, `size` is its font
+  size, and `edges` are the left of each character and the right of the last,
+  in points.
+  """
+
+  digest = hashlib.sha1(content).hexdigest()
+  if digest not in pdf_pages_memo:
+    pages = None
+    if PDF_CACHE_DIR:
+      path = os.path.join(PDF_CACHE_DIR, '%s.json' % digest)
+      try:
+        with open(path) as f:
+          pages = json.load(f)
+      except (IOError, ValueError):
+        pass
+    if pages is None:
+      pages = extract_pdf_pages(content)
+      if PDF_CACHE_DIR:
+        if not os.path.isdir(PDF_CACHE_DIR):
+          try:
+            os.makedirs(PDF_CACHE_DIR)
+          except OSError:  # Another process created it.
+            pass
+        fd, tmp = tempfile.mkstemp(dir=PDF_CACHE_DIR)
+        with os.fdopen(fd, 'w') as f:
+          json.dump(pages, f)
+        os.rename(tmp, path)
+    pdf_pages_memo[digest] = pages
+  return pdf_pages_memo[digest]
+
+
+def pdf_lines(page):
+
+  """
+  Returns the page's lines of text from top to bottom and left to right, as
+  `(x0, y, size, column, text)` tuples, where `column` is the offset at which
+  `pdftotext -layout` would write the line.
+
+  Like `pdftotext -layout`, a line in a block starts one column after every
+  line to its left in the block, or at the column of the first character of an
+  overlapping line that is right of the line's start. A block starts three
+  columns after every block to its left, or at the proportional column of an
+  overlapping block.
+  """
+
+  lines = []
+  blocks = []
+  for block in page:
+    # Assign columns to the block's lines, from left to right.
+    block = sorted(block, key=lambda line: (line[0], line[2]))
+    columns = []
+    for x0, x1, y, size, text, edges in block:
+      column = 0
+      for other, (_, other_x1, _, _, other_text, other_edges) in zip(columns, block):
+        if x0 >= other_x1:
+          column = max(column, other + len(other_text) + 1)
+        else:
+          k = 0
+          while k < len(other_text) and x0 >= (other_edges[k] + other_edges[k + 1]) / 2:
+            k += 1
+          column = max(column, other + k)
+      columns.append(column)
+    width = max(column + len(line[4]) for column, line in zip(columns, block))
+    blocks.append((min(line[0] for line in block), max(line[1] for line in block), width, zip(columns, block)))
+
+  # Assign columns to the blocks, from left to right.
+  offsets = []
+  blocks.sort(key=lambda block: (block[0], min(line[2] for _, line in block[3])))
+  for x0, x1, width, block_lines in blocks:
+    offset = 0
+    for other, (other_x0, other_x1, other_width, _) in zip(offsets, blocks):
+      if x0 > other_x1:
+        offset = max(offset, other + other_width + 3)
+      elif other_x1 > other_x0:
+        offset = max(offset, other + int((x0 - other_x0) / (other_x1 - other_x0) * other_width))
+      else:
+        offset = max(offset, other)
+    offsets.append(offset)
+    for column, (line_x0, _, y, size, text, _) in block_lines:
+      lines.append((line_x0, y, size, offset + column, text))
+
+  # Lines whose baselines are within half a font size are on one row.
+  rows = []
+  for line in sorted(lines, key=lambda line: line[1]):
+    if rows and line[1] - rows[-1][0][1] < rows[-1][0][2] / 2:
+      rows[-1].append(line)
+    else:
+      rows.append([line])
+  return [line for row in rows for line in sorted(row, key=lambda line: line[3])]
+
+
+def pdf_to_text(content, layout=False):
+
+  """
+  Returns the UTF-8 text of a PDF from its content, with each page followed by
+  a form feed, like `pdftotext`. With `layout`, like `pdftotext -layout`, lines
+  are padded to their columns, and blank lines are added for vertical gaps;
+  otherwise, blocks of text are in reading order.
+  """
+
+  text = u''
+  for page in pdf_pages(content):
+    if layout:
+      lines = pdf_lines(page)
+      row = u''
+      for i, (x0, y, size, column, line) in enumerate(lines):
+        row = row.ljust(column) + line
+        if i == len(lines) - 1:
+          text += row + u'\n'
+        elif lines[i + 1][3] < len(row) or lines[i + 1][1] - y > size / 2:
+          # One line feed per font size of vertical gap, up to five.
+          feeds = int((lines[i + 1][1] - y) / size) if size else 1
+          text += row + u'\n' * max(1, min(5, feeds))
+          row = u''
+    else:
+      for block in page:
+        text += u''.join(line[4] + u'\n' for line in block) + u'\n'
+    text += u'\f'
+  return text.encode('utf-8')
+
+
+non_whitespace_re = re.compile(r'\S+')
+
+
+def detect_columns(lines, min_gap=2, tolerance=0, count=None):
+
+  """
+  Detects the columns of fixed-width lines of text, like the output of
+  `pdf_to_text(content, layout=True)`, from a histogram of the offsets at which
+  the lines have non-whitespace characters. A gutter between columns is a run
+  of at least `min_gap` offsets at which at most a `tolerance` fraction of the
+  lines have such characters. If `count` is set, only the `count - 1` widest
+  gutters are kept. Returns the `(start, end)` offsets of each column, where the
+  last column's `end` is None.
+  """
+
+  # Count the words that start and end at each offset, and sum the difference.
+  width = max(len(line) for line in lines) if lines else 0
+  changes = [0] * (width + 1)
+  for line in lines:
+    for match in non_whitespace_re.finditer(line):
+      changes[match.start()] += 1
+      changes[match.end()] -= 1
+  limit = tolerance * len(lines)
+
+  gutters = []
+  start = None
+  value = 0
+  for offset, change in enumerate(changes):
+    value += change
+    if value <= limit:
+      if start is None:
+        start = offset
+    else:
+      # A gutter must be between two columns, not before the first.
+      if start is not None and start > 0 and offset - start >= min_gap:
+        gutters.append((start, offset))
+      start = None
+
+  if count:
+    gutters = sorted(sorted(gutters, key=lambda gutter: gutter[0] - gutter[1])[:count - 1])
+  starts = [0] + [end for _, end in gutters]
+  return zip(starts, starts[1:] + [None])
+
+
+def split_columns(line, columns):
+  return [line[start:end].strip() for start, end in columns]
+
+
+def header_columns(header, columns):
+
+  """
+  Names columns from the labels in a header line that start within each column.
+  Labels are separated by two or more spaces. A column without a label, like
+  the second part of a wide address, is merged into the previous column.
+  Returns the merged columns and their names.
+  """
+
+  labels = [[] for _ in columns]
+  for match in re.finditer(r'\S+(?: \S+)*', header):
+    for i, (start, end) in enumerate(columns):
+      if match.start() >= start and (end is None or match.start() < end):
+        labels[i].append(match.group(0))
+        break
+
+  merged = []
+  names = []
+  for (start, end), column_labels in zip(columns, labels):
+    if column_labels or not merged:
+      merged.append((start, end))
+      names.append(' '.join(column_labels))
+    else:
+      merged[-1] = (merged[-1][0], end)
+  return merged, names
+
+
+def table_rows(lines, columns, names):
+
+  """
+  Splits fixed-width lines of text into columns, and returns each line as a
+  dict from the columns' names to their stripped text.
+  """
+
+  return [dict(zip(names, split_columns(line, columns))) for line in lines]